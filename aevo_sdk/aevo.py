@@ -1,8 +1,10 @@
 import asyncio
 import json
+import os
 import random
 import time
 import traceback
+from concurrent.futures import ProcessPoolExecutor
 
 import requests
 import websockets
@@ -34,6 +36,8 @@ CONFIG = {
     },
 }
 
+REST_TIMEOUT = 10  # seconds for order requests, a hung post would hold the order slot
+
 ADDRESSES = {
     "testnet": {
         "l1_bridge": "0xb459023ECAf4ee7E55BEC136e592d2B7afF482E2",
@@ -68,6 +72,92 @@ class Withdraw(EIP712Struct):
     data = Bytes(32)
 
 
+# Per-process state for the batch signing pool, set once by _init_signing_worker
+_worker_state = {}
+
+
+def _init_signing_worker(signing_key, wallet_address, signing_domain):
+    _worker_state["signing_key"] = signing_key
+    _worker_state["wallet_address"] = wallet_address
+    _worker_state["domain_hash"] = make_domain(**signing_domain).hash_struct()
+
+
+def _order_row(
+    wallet_address,
+    instrument_id,
+    is_buy,
+    limit_price,
+    quantity,
+    timestamp,
+    salt,
+    price_decimals=10**6,
+    amount_decimals=10**6,
+):
+    # Order member values in definition order, see Order.hash_structs
+    return (
+        wallet_address,
+        is_buy,
+        int(round(limit_price * price_decimals, is_buy)),
+        int(round(quantity * amount_decimals, is_buy)),
+        salt,
+        instrument_id,
+        timestamp,
+    )
+
+
+def _sign_struct_hash(domain_hash, signing_key, salt, struct_hash):
+    signable_bytes = keccak(b"\x19\x01" + domain_hash + struct_hash)
+    return (
+        salt,
+        Account._sign_hash(signable_bytes, signing_key).signature.hex(),
+        f"0x{signable_bytes.hex()}",
+    )
+
+
+def _sign_order_hash(
+    domain_hash,
+    signing_key,
+    wallet_address,
+    instrument_id,
+    is_buy,
+    limit_price,
+    quantity,
+    timestamp,
+    salt,
+    price_decimals=10**6,
+    amount_decimals=10**6,
+):
+    order_struct = Order(
+        maker=wallet_address,  # The wallet"s main address
+        isBuy=is_buy,
+        limitPrice=int(round(limit_price * price_decimals, is_buy)),
+        amount=int(round(quantity * amount_decimals, is_buy)),
+        salt=salt,
+        instrument=instrument_id,
+        timestamp=timestamp,
+    )
+    return _sign_struct_hash(domain_hash, signing_key, salt, order_struct.hash_struct())
+
+
+def _sign_orders(domain_hash, signing_key, wallet_address, orders):
+    struct_hashes = Order.hash_structs(
+        [_order_row(wallet_address, **order) for order in orders]
+    )
+    return [
+        _sign_struct_hash(domain_hash, signing_key, order["salt"], struct_hash)
+        for order, struct_hash in zip(orders, struct_hashes)
+    ]
+
+
+def _sign_orders_worker(orders):
+    return _sign_orders(
+        _worker_state["domain_hash"],
+        _worker_state["signing_key"],
+        _worker_state["wallet_address"],
+        orders,
+    )
+
+
 class AevoLibClient:
     def __init__(
         self,
@@ -92,6 +182,9 @@ class AevoLibClient:
         }
         self.extra_headers = None
         self.rest_headers.update(rest_headers)
+        self.signing_pool = None
+        self.signing_pool_size = 0
+        self._domain_hash = None
 
         if (env != "testnet") and (env != "mainnet"):
             raise ValueError("env must either be 'testnet' or 'mainnet'")
@@ -113,6 +206,12 @@ class AevoLibClient:
     def signing_domain(self):
         return CONFIG[self.env]["signing_domain"]
 
+    @property
+    def domain_hash(self):
+        if self._domain_hash is None:
+            self._domain_hash = make_domain(**self.signing_domain).hash_struct()
+        return self._domain_hash
+
     async def open_connection(self, extra_headers={}):
         try:
             logger.info("Opening Aevo websocket connection...")
@@ -225,13 +324,25 @@ class AevoLibClient:
             instrument_id=int(instrument_id), is_buy=is_buy, limit_price=limit_price, quantity=quantity, post_only=post_only,close_position=close_position,stop=stop,trigger=trigger,reduce_only=reduce_only,time_in_force=time_in_force,
         )
         logger.info(data)
+        return self.rest_post_order(data)
+
+    def rest_post_order(self, data):
         req = self.client.post(
-            f"{self.rest_url}/orders", json=data, headers=self.rest_headers
+            f"{self.rest_url}/orders", json=data, headers=self.rest_headers, timeout=REST_TIMEOUT
         )
         try:
             return req.json()
         except:
-            return req.text()
+            return req.text
+
+    def rest_edit_order(self, order_id, data):
+        req = self.client.post(
+            f"{self.rest_url}/orders/{order_id}", json=data, headers=self.rest_headers, timeout=REST_TIMEOUT
+        )
+        try:
+            return req.json()
+        except:
+            return req.text
 
     def rest_create_market_order(self, instrument_id, is_buy, quantity,reduce_only):
         limit_price = 0
@@ -366,6 +477,16 @@ class AevoLibClient:
             )
         )
 
+    async def unsubscribe(self, channel):
+        await self.send(
+            json.dumps(
+                {
+                    "op": "unsubscribe",
+                    "data": [channel],
+                }
+            )
+        )
+
     async def subscribe_trades(self, instrument_name):
         await self.send(
             json.dumps(
@@ -414,6 +535,8 @@ class AevoLibClient:
         mmp=True,
         price_decimals=10**6,
         amount_decimals=10**6,
+        reduce_only=None,
+        time_in_force=None,
     ):
         timestamp = int(time.time())
         salt, signature, order_id = self.sign_order(
@@ -437,8 +560,46 @@ class AevoLibClient:
             "mmp": mmp,
             "timestamp": timestamp,
         }
+        if reduce_only is not None:
+            payload["reduce_only"] = reduce_only
+        if time_in_force is not None:
+            payload["time_in_force"] = time_in_force
         return payload, order_id
 
+    def edit_order_ws_json(
+        self,
+        order_id,
+        instrument_id,
+        is_buy,
+        limit_price,
+        quantity,
+        post_only=True,
+        mmp=True,
+    ):
+        timestamp = int(time.time())
+        instrument_id = int(instrument_id)
+        salt, signature, new_order_id = self.sign_order(
+            instrument_id=instrument_id,
+            is_buy=is_buy,
+            limit_price=limit_price,
+            quantity=quantity,
+            timestamp=timestamp,
+        )
+        payload = {
+            "order_id": order_id,
+            "instrument": instrument_id,
+            "maker": self.wallet_address,
+            "is_buy": is_buy,
+            "amount": str(int(round(quantity * 10**6, is_buy))),
+            "limit_price": str(int(round(limit_price * 10**6, is_buy))),
+            "salt": str(salt),
+            "signature": signature,
+            "post_only": post_only,
+            "mmp": mmp,
+            "timestamp": timestamp,
+        }
+        return payload, new_order_id
+
     def create_order_rest_json(
         self,
         instrument_id,
@@ -484,6 +645,21 @@ class AevoLibClient:
 
         return payload, order_id
 
+    def order_rest_json(self, data):
+        """The REST body for an order signed by create_order_ws_json.
+
+        It keeps the salt and signature, so both bodies are the same order and the exchange
+        takes at most one of them.
+        """
+        payload = {
+            key: data[key]
+            for key in ("maker", "is_buy", "instrument", "limit_price", "amount", "salt", "signature", "post_only", "timestamp")
+        }
+        payload["reduce_only"] = data.get("reduce_only", False)
+        payload["close_position"] = False
+        payload["time_in_force"] = data.get("time_in_force", "GTC")
+        return payload
+
     async def create_order(
         self,
         instrument_id,
@@ -522,31 +698,16 @@ class AevoLibClient:
         post_only=True,
         mmp=True,
     ):
-        timestamp = int(time.time())
-        instrument_id = int(instrument_id)
-        salt, signature, new_order_id = self.sign_order(
+        data, new_order_id = self.edit_order_ws_json(
+            order_id=order_id,
             instrument_id=instrument_id,
             is_buy=is_buy,
             limit_price=limit_price,
             quantity=quantity,
-            timestamp=timestamp,
+            post_only=post_only,
+            mmp=mmp,
         )
-        payload = {
-            "op": "edit_order",
-            "data": {
-                "order_id": order_id,
-                "instrument": instrument_id,
-                "maker": self.wallet_address,
-                "is_buy": is_buy,
-                "amount": str(int(round(quantity * 10**6, is_buy))),
-                "limit_price": str(int(round(limit_price * 10**6, is_buy))),
-                "salt": str(salt),
-                "signature": signature,
-                "post_only": post_only,
-                "mmp": mmp,
-                "timestamp": timestamp,
-            },
-        }
+        payload = {"op": "edit_order", "data": data}
 
         if id:
             payload["id"] = id
@@ -556,11 +717,13 @@ class AevoLibClient:
 
         return new_order_id
 
-    async def cancel_order(self, order_id):
+    async def cancel_order(self, order_id, id=None):
         if not order_id:
             return
 
         payload = {"op": "cancel_order", "data": {"order_id": order_id}}
+        if id:
+            payload["id"] = id
         logger.info(payload)
         await self.send(json.dumps(payload))
 
@@ -579,25 +742,81 @@ class AevoLibClient:
         amount_decimals=10**6,
     ):
         salt = random.randint(0, 10**10)  # We just need a large enough number
-
-        order_struct = Order(
-            maker=self.wallet_address,  # The wallet"s main address
-            isBuy=is_buy,
-            limitPrice=int(round(limit_price * price_decimals, is_buy)),
-            amount=int(round(quantity * amount_decimals, is_buy)),
-            salt=salt,
-            instrument=instrument_id,
-            timestamp=timestamp,
-        )
         logger.info(self.signing_domain)
-        domain = make_domain(**self.signing_domain)
-        signable_bytes = keccak(order_struct.signable_bytes(domain=domain))
-        return (
-            salt,
-            Account._sign_hash(signable_bytes, self.signing_key).signature.hex(),
-            f"0x{signable_bytes.hex()}",
+        return _sign_order_hash(
+            self.domain_hash,
+            self.signing_key,
+            self.wallet_address,
+            instrument_id=instrument_id,
+            is_buy=is_buy,
+            limit_price=limit_price,
+            quantity=quantity,
+            timestamp=timestamp,
+            salt=salt,
+            price_decimals=price_decimals,
+            amount_decimals=amount_decimals,
         )
 
+    def open_signing_pool(self, max_workers=None):
+        if self.signing_pool is None:
+            self.signing_pool_size = max_workers or os.cpu_count() or 1
+            # workers hold the key and the domain hash from start up, orders only carry their fields
+            self.signing_pool = ProcessPoolExecutor(
+                max_workers=self.signing_pool_size,
+                initializer=_init_signing_worker,
+                initargs=(self.signing_key, self.wallet_address, self.signing_domain),
+            )
+        return self.signing_pool
+
+    def close_signing_pool(self):
+        if self.signing_pool is not None:
+            self.signing_pool.shutdown()
+            self.signing_pool = None
+
+    def _batch_orders(self, orders, timestamp):
+        if timestamp is None:
+            timestamp = int(time.time())
+        batch = []
+        for order in orders:
+            order = dict(order)
+            order["instrument_id"] = int(order["instrument_id"])
+            order.setdefault("timestamp", timestamp)
+            # salts are drawn here, forked workers would share the parent's random state
+            order["salt"] = random.randint(0, 10**10)
+            batch.append(order)
+        return batch
+
+    def _submit_order_chunks(self, batch):
+        pool = self.open_signing_pool()
+        chunk_size = -(-len(batch) // self.signing_pool_size)
+        return [
+            pool.submit(_sign_orders_worker, batch[i : i + chunk_size])
+            for i in range(0, len(batch), chunk_size)
+        ]
+
+    def sign_orders_batch(self, orders, timestamp=None, min_pool_batch=16):
+        """Sign many orders across the signing pool.
+
+        Each order is a dict of ``sign_order`` arguments (``instrument_id``, ``is_buy``,
+        ``limit_price``, ``quantity`` and optionally ``timestamp``, ``price_decimals`` and
+        ``amount_decimals``). Returns ``(salt, signature, order_id)`` tuples in input order.
+        """
+        batch = self._batch_orders(orders, timestamp)
+        if len(batch) < min_pool_batch:
+            return _sign_orders(self.domain_hash, self.signing_key, self.wallet_address, batch)
+        results = []
+        for future in self._submit_order_chunks(batch):
+            results.extend(future.result())
+        return results
+
+    async def async_sign_orders_batch(self, orders, timestamp=None):
+        batch = self._batch_orders(orders, timestamp)
+        if not batch:
+            return []
+        futures = [asyncio.wrap_future(f) for f in self._submit_order_chunks(batch)]
+        chunks = await asyncio.gather(*futures)
+        return [result for chunk in chunks for result in chunk]
+
     def create_withdraw(self, collateral, to, amount, data, amount_decimals):
         if data == None:
             data = keccak(bytearray()).hex()
@@ -3,18 +3,20 @@ import os
 from loguru import logger
 import requests
 import random
-from web3 import AsyncWeb3, Web3
+from web3 import AsyncWeb3
 from aiohttp import ClientSession
 from eth_abi import encode
 import os
 from dotenv import load_dotenv
 
+from web3_pool import get_async_web3
+
 from .aevo import AevoLibClient
 from .aevo_trading_tool.aevo_deposit import aevo_deposit
 
 
 class AevoClient:
-    def __init__(self) -> None:
+    def __init__(self, instruments=None) -> None:
         dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
         load_dotenv(dotenv_path=dotenv_path)
         self.ADDRESS = os.environ.get('address')
@@ -30,6 +32,7 @@ class AevoClient:
         self.NODE_URL = os.environ.get('rpc_end_point')
         self.TAKER_FEE = 0.0008
         self.MAKER_FEE = 0.0005
+        self.instruments = instruments  # optional InstrumentCache, saves a /markets call per coin
 
         self.aevo_client = AevoLibClient(
             signing_key=self.SIGNING_KEY,
@@ -40,8 +43,10 @@ class AevoClient:
         )
 
     def update_leverage(self,leverage,coin):
-        market_data = self.get_markets(asset=coin,instrument='PERPETUAL')
-        instrument_id = market_data[0]['instrument_id']
+        instrument_id = self.instruments.instrument_id(coin) if self.instruments else None
+        if instrument_id is None:
+            market_data = self.get_markets(asset=coin,instrument='PERPETUAL')
+            instrument_id = market_data[0]['instrument_id']
         update_leverage_rsp = self.aevo_client.update_leverage(instrument_id=instrument_id,leverage=leverage)
         logger.info(f'Updated leverage on AEVO for {coin}: {leverage}')
         return update_leverage_rsp
@@ -164,8 +169,8 @@ class AevoClient:
         
         return result
     
-    async def deposit(self,amount:float)-> None:
-        await aevo_deposit(amount=amount)
+    async def deposit(self,amount:float):
+        return await aevo_deposit(amount=amount)
 
     async def sign_withdraw(
             self,
@@ -211,7 +216,7 @@ class AevoClient:
         return key_signature.signature.hex()
 
     async def withdraw(self, amount: float):
-        web3 = AsyncWeb3(Web3.HTTPProvider(self.NODE_URL))
+        web3 = get_async_web3(self.NODE_URL)
         salt = random.randint(0, 10 ** 10)
         amount_in_micro = int(amount * 10 ** 6)  # Convert amount to micro-units as expected by the contract
         socket_fees = random.randint(4326304606198636, 4326309606198636)
@@ -0,0 +1,168 @@
+import asyncio
+import json
+from loguru import logger
+
+from .aevo import AevoLibClient
+
+# REST rejects of an order id the exchange already has, i.e. the websocket copy got through
+DUPLICATE_ORDER_ERRORS = ('DUPLICATE', 'ALREADY_EXISTS', 'ORDER_EXISTS')
+
+
+class AevoOrderGateway:
+    """Sends orders over the authenticated Aevo websocket and correlates acks by request id.
+
+    Every request gets its own id and future. The future resolves with the ``data`` of the ack
+    frame, or ``{'error': ...}`` for a reject, the same shapes the REST endpoints return. When
+    no frame arrives within ``timeout`` seconds the already signed order is sent over REST, so
+    an order that did reach the websocket keeps its order id and is not placed twice. REST then
+    rejects it as a duplicate, which means it was accepted, and the result is taken from the
+    order's next update on the ``orders`` channel instead.
+    """
+
+    def __init__(self, aevo_client: AevoLibClient, timeout=2, rest_fallback=True, order_tracker=None, update_timeout=5) -> None:
+        self.aevo_client = aevo_client
+        self.order_tracker = order_tracker
+        self.timeout = timeout
+        self.update_timeout = update_timeout
+        self.rest_fallback = rest_fallback
+        self.request_id = 1  # id 1 is taken by the auth message in open_connection
+        self.pending = {}
+
+    def next_request_id(self):
+        self.request_id += 1
+        return self.request_id
+
+    @property
+    def connected(self):
+        connection = self.aevo_client.connection
+        return connection is not None and connection.open
+
+    def handle_message(self, msg):
+        """Resolves the future waiting on ``msg``. Returns True if the frame was an ack or reject."""
+        if not self.pending:
+            return False
+        if isinstance(msg, (str, bytes)):
+            try:
+                msg = json.loads(msg)
+            except json.JSONDecodeError:
+                return False
+        if not isinstance(msg, dict):
+            return False
+        future = self.pending.pop(msg.get('id'), None)
+        if future is None:
+            return False
+        if not future.done():
+            if 'error' in msg:
+                future.set_result({'error': msg['error']})
+            else:
+                future.set_result(msg.get('data', msg))
+        return True
+
+    async def request(self, op, data, rest_call, *rest_args):
+        """Sends ``op`` and returns a future for its ack, reject, timeout or REST fallback.
+
+        ``rest_call`` is a coroutine function, see ``rest``.
+        """
+        if not self.connected:
+            return asyncio.ensure_future(rest_call(*rest_args))
+        request_id = self.next_request_id()
+        ack = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = ack
+        await self.aevo_client.send(json.dumps({"op": op, "id": request_id, "data": data}))
+        return asyncio.ensure_future(self.wait(request_id, ack, rest_call, *rest_args))
+
+    async def wait(self, request_id, ack, rest_call, *rest_args):
+        try:
+            return await asyncio.wait_for(ack, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.pending.pop(request_id, None)
+            if not self.rest_fallback:
+                return {'error': 'TIMEOUT'}
+            logger.warning(f"No aevo websocket ack for request {request_id}, falling back to REST")
+            return await rest_call(*rest_args)
+
+    async def rest(self, call, *args):
+        return await asyncio.to_thread(call, *args)
+
+    async def rest_create_order(self, data, order_id):
+        response = await self.rest(self.aevo_client.rest_post_order, data)
+        error = response.get('error') if isinstance(response, dict) else None
+        if not error or not any(duplicate in str(error).upper() for duplicate in DUPLICATE_ORDER_ERRORS):
+            return response
+        logger.info(f"Aevo order {order_id} already placed over the websocket, waiting for its update")
+        order = None
+        if self.order_tracker is not None and order_id:
+            order = await self.order_tracker.wait_for_update(order_id, self.update_timeout)
+        if order is None:
+            # accepted either way, the orders channel brings its state later
+            return {'order_id': order_id, 'order_status': 'opened'}
+        return {'order_id': order.order_id, 'order_status': order.state}
+
+    async def create_order(
+        self,
+        instrument_id,
+        is_buy,
+        limit_price,
+        quantity,
+        post_only=True,
+        reduce_only=None,
+        time_in_force=None,
+        payload=None,
+        order_id=None,
+    ):
+        if payload:
+            # a pre-signed REST payload, the websocket takes the same fields minus the unset ones
+            data = {key: value for key, value in payload.items() if value is not None}
+            rest_data = payload
+        else:
+            data, order_id = self.aevo_client.create_order_ws_json(
+                instrument_id=int(instrument_id),
+                is_buy=is_buy,
+                limit_price=limit_price,
+                quantity=quantity,
+                post_only=post_only,
+                reduce_only=reduce_only,
+                time_in_force=time_in_force,
+            )
+            rest_data = self.aevo_client.order_rest_json(data)
+        logger.info(data)
+        future = await self.request("create_order", data, self.rest_create_order, rest_data, order_id)
+        if self.order_tracker is not None and order_id:
+            self.order_tracker.register(order_id, instrument_id=int(instrument_id), is_buy=is_buy, amount=quantity, limit_price=limit_price)
+            future.add_done_callback(lambda done: self.track_response(order_id, done))
+        return future
+
+    def track_response(self, order_id, done):
+        if done.cancelled() or done.exception() is not None:
+            return
+        self.order_tracker.on_response(order_id, done.result())
+
+    async def place_order(self, instrument_id, is_buy, limit_price, quantity, **kwargs):
+        future = await self.create_order(instrument_id, is_buy, limit_price, quantity, **kwargs)
+        return await future
+
+    async def edit_order(
+        self,
+        order_id,
+        instrument_id,
+        is_buy,
+        limit_price,
+        quantity,
+        post_only=True,
+        mmp=True,
+    ):
+        data, new_order_id = self.aevo_client.edit_order_ws_json(
+            order_id=order_id,
+            instrument_id=instrument_id,
+            is_buy=is_buy,
+            limit_price=limit_price,
+            quantity=quantity,
+            post_only=post_only,
+            mmp=mmp,
+        )
+        logger.info(data)
+        return await self.request("edit_order", data, self.rest, self.aevo_client.rest_edit_order, order_id, data)
+
+    async def cancel_order(self, order_id):
+        data = {"order_id": order_id}
+        return await self.request("cancel_order", data, self.rest, self.aevo_client.rest_cancel_order, order_id)
@@ -0,0 +1,205 @@
+import asyncio
+from collections import deque
+
+from loguru import logger
+
+# An order only moves forward through these ranks, late frames for an earlier state are ignored
+ORDER_STATE_RANK = {
+    'pending': 0,
+    'opened': 1,
+    'partial': 2,
+    'filled': 3,
+    'cancelled': 3,
+    'rejected': 3,
+}
+TERMINAL_STATES = {'filled', 'cancelled', 'rejected'}
+MAX_DONE_ORDERS = 100  # finished orders kept for late frames, older ones are dropped
+
+
+class TrackedOrder:
+    __slots__ = (
+        'order_id',
+        'instrument_id',
+        'is_buy',
+        'amount',
+        'limit_price',
+        'state',
+        'filled',
+        'notional',
+        'fill_ids',
+        'error',
+    )
+
+    def __init__(self, order_id, instrument_id=None, is_buy=None, amount=0.0, limit_price=None) -> None:
+        self.order_id = order_id
+        self.instrument_id = instrument_id
+        self.is_buy = is_buy
+        self.amount = amount
+        self.limit_price = limit_price
+        self.state = 'pending'
+        self.filled = 0.0
+        self.notional = 0.0
+        self.fill_ids = set()
+        self.error = None
+
+    @property
+    def avg_price(self):
+        if not self.filled:
+            return None
+        return self.notional / self.filled
+
+    @property
+    def is_done(self):
+        return self.state in TERMINAL_STATES
+
+    def __repr__(self) -> str:
+        error = f", error={self.error}" if self.error else ""
+        return f"TrackedOrder({self.order_id}, {self.state}, filled={self.filled}/{self.amount}, avg_price={self.avg_price}{error})"
+
+
+class AevoOrderTracker:
+    """Book-keeping for our Aevo orders, fed by the private ``orders`` and ``fills`` channels.
+
+    Orders are indexed by the order id ``AevoLibClient.sign_order`` returns. The bot checks its
+    entries' state, filled amount and average price here, and cancels the open orders left on an
+    instrument before closing it, without calling ``/account``. Open orders are indexed on their
+    own and only the last ``MAX_DONE_ORDERS`` finished ones are kept.
+    """
+
+    def __init__(self, on_update=None) -> None:
+        self.orders = {}
+        self.open = {}  # the orders not done yet, by key
+        self.done = deque()  # keys of finished orders, oldest first
+        self.on_update = on_update
+        self.waiters = {}  # order id -> [(future, states)] waiting for the order to reach one of states
+
+    @staticmethod
+    def key(order_id):
+        return order_id.lower() if isinstance(order_id, str) else order_id
+
+    def open_orders(self):
+        return list(self.open.values())
+
+    def register(self, order_id, instrument_id=None, is_buy=None, amount=0.0, limit_price=None):
+        key = self.key(order_id)
+        order = self.orders.get(key)
+        if order is None:
+            order = TrackedOrder(key, instrument_id, is_buy, float(amount), limit_price)
+            self.orders[key] = order
+            self.open[key] = order
+        return order
+
+    def transition(self, order, state):
+        if state not in ORDER_STATE_RANK or order.is_done:
+            return False
+        if ORDER_STATE_RANK[state] < ORDER_STATE_RANK[order.state]:
+            return False
+        order.state = state
+        if order.is_done:
+            self.finish(order)
+        return True
+
+    def finish(self, order):
+        self.open.pop(order.order_id, None)
+        self.done.append(order.order_id)
+        while len(self.done) > MAX_DONE_ORDERS:
+            self.orders.pop(self.done.popleft(), None)
+
+    def handle_message(self, msg):
+        """Applies an ``orders`` or ``fills`` frame. Returns True if the frame was one of ours."""
+        channel = msg.get('channel')
+        data = msg.get('data')
+        if not isinstance(data, dict):
+            return False
+        if channel == 'orders':
+            for order_data in data.get('orders', []):
+                self.apply_order(order_data)
+            return True
+        if channel == 'fills':
+            fill = data.get('fill')
+            if fill:
+                self.apply_fill(fill)
+            return True
+        return False
+
+    def apply_order(self, data):
+        order_id = data.get('order_id')
+        if not order_id:
+            return None
+        order = self.register(order_id)
+        if order.instrument_id is None:
+            order.instrument_id = data.get('instrument_id')
+        if order.is_buy is None and 'side' in data:
+            order.is_buy = data['side'] == 'buy'
+        if 'amount' in data:
+            order.amount = float(data['amount'])
+        if order.limit_price is None and 'price' in data:
+            order.limit_price = float(data['price'])
+        # filled size and average price come from the fills channel only, so nothing is counted twice
+        self.transition(order, data.get('order_status'))
+        self.notify(order)
+        return order
+
+    def apply_fill(self, fill):
+        order_id = fill.get('order_id')
+        if not order_id:
+            return None
+        order = self.register(order_id, instrument_id=fill.get('instrument_id'), is_buy=fill.get('side') == 'buy')
+        fill_id = fill.get('trade_id') or fill.get('fill_id')
+        if fill_id in order.fill_ids:
+            return order
+        order.fill_ids.add(fill_id)
+        size = float(fill.get('filled') or fill.get('amount') or 0)
+        order.notional += size * float(fill['price'])
+        order.filled += size
+        state = fill.get('order_status')
+        if state is None:
+            state = 'filled' if order.amount and order.filled >= order.amount else 'partial'
+        self.transition(order, state)
+        self.notify(order)
+        return order
+
+    def on_response(self, order_id, response):
+        # websocket ack or REST response to one of our own create_order requests
+        order = self.register(order_id)
+        if not isinstance(response, dict):
+            return order
+        if 'error' in response:
+            order.error = response['error']
+            self.transition(order, 'rejected')
+            self.notify(order)
+            return order
+        response = dict(response, order_id=response.get('order_id', order_id))
+        return self.apply_order(response)
+
+    async def wait_for_update(self, order_id, timeout, states=None):
+        """Waits until the order reaches one of ``states`` and returns it, or None after ``timeout`` seconds.
+
+        By default any state past 'pending' will do.
+        """
+        states = states or set(ORDER_STATE_RANK) - {'pending'}
+        order = self.register(order_id)
+        if order.state in states:
+            return order
+        waiter = (asyncio.get_running_loop().create_future(), states)
+        self.waiters.setdefault(order.order_id, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter[0], timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self.waiters.get(order.order_id)
+            if waiters is not None and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del self.waiters[order.order_id]
+
+    def notify(self, order):
+        for future, states in self.waiters.get(order.order_id, []):
+            if order.state in states and not future.done():
+                future.set_result(order)
+        if self.on_update:
+            try:
+                self.on_update(order)
+            except Exception as e:
+                logger.error(f"Error in aevo order update callback: {e}")
@@ -0,0 +1,137 @@
+import asyncio
+import time
+import traceback
+from loguru import logger
+
+from .aevo import AevoLibClient
+
+
+class AevoPreSigner:
+    """Keeps signed Aevo entry orders ready for the current best candidate.
+
+    The ladder covers ``price_levels`` ticks and ``size_levels`` lots on each side of the
+    expected entry so a small move in the mark still finds a ready payload. Payloads are
+    re-signed with a fresh timestamp and salt before they reach ``max_age`` seconds.
+    """
+
+    def __init__(self, aevo_client: AevoLibClient, price_levels=2, size_levels=1, max_age=30, refresh_interval=1) -> None:
+        self.aevo_client = aevo_client
+        self.price_levels = price_levels
+        self.size_levels = size_levels
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.candidate = None
+        self.orders = {}
+        self.signed_at = 0
+        self.refresh_event = asyncio.Event()
+
+    @staticmethod
+    def order_key(instrument_id, is_buy, limit_price, quantity, price_decimals=10**6, amount_decimals=10**6):
+        # same integer conversion as AevoLibClient.create_order_rest_json so lookups match the signed payload
+        return (
+            int(instrument_id),
+            is_buy,
+            str(int(round(limit_price * price_decimals, is_buy))),
+            str(int(round(quantity * amount_decimals, is_buy))),
+        )
+
+    def set_candidate(self, instrument_id, is_buy, limit_price, quantity, price_step, amount_step):
+        candidate = {
+            'instrument_id': int(instrument_id),
+            'is_buy': is_buy,
+            'limit_price': limit_price,
+            'quantity': quantity,
+            'price_step': price_step,
+            'amount_step': amount_step,
+        }
+        self.candidate = candidate
+        if not self.covers(instrument_id, is_buy, limit_price, quantity):
+            self.refresh_event.set()
+
+    def clear_candidate(self):
+        self.candidate = None
+        self.orders = {}
+
+    def covers(self, instrument_id, is_buy, limit_price, quantity):
+        if self.is_stale():
+            return False
+        return self.order_key(instrument_id, is_buy, limit_price, quantity) in self.orders
+
+    def is_stale(self):
+        # re-sign at half life so a payload is never sent close to its expiry
+        return time.time() - self.signed_at > self.max_age / 2
+
+    def take(self, instrument_id, is_buy, limit_price, quantity):
+        """Returns ``(payload, order_id)`` for a matching pre-signed order, or ``(None, None)``."""
+        if time.time() - self.signed_at > self.max_age:
+            return None, None
+        payload, order_id = self.orders.pop(self.order_key(instrument_id, is_buy, limit_price, quantity), (None, None))
+        if payload:
+            # every ladder entry shares the timestamp, a fresh one is needed for the next entry
+            self.orders = {}
+            self.signed_at = 0
+            self.refresh_event.set()
+        return payload, order_id
+
+    def ladder(self, candidate):
+        price_step = candidate['price_step']
+        amount_step = candidate['amount_step']
+        prices = [candidate['limit_price'] + level * price_step for level in range(-self.price_levels, self.price_levels + 1)]
+        sizes = [candidate['quantity'] + level * amount_step for level in range(-self.size_levels, self.size_levels + 1)]
+        return [(price, size) for price in prices if price > 0 for size in sizes if size > 0]
+
+    def sign_ladder(self, candidate):
+        timestamp = int(time.time())
+        rows = [
+            {'instrument_id': candidate['instrument_id'], 'is_buy': candidate['is_buy'], 'limit_price': limit_price, 'quantity': quantity}
+            for limit_price, quantity in self.ladder(candidate)
+        ]
+        orders = {}
+        # the whole ladder is hashed and signed in one batch
+        for row, (salt, signature, order_id) in zip(rows, self.aevo_client.sign_orders_batch(rows, timestamp=timestamp)):
+            key = self.order_key(row['instrument_id'], row['is_buy'], row['limit_price'], row['quantity'])
+            # mirrors the payload AevoLibClient.rest_create_order sends for a plain limit entry
+            payload = {
+                "maker": self.aevo_client.wallet_address,
+                "is_buy": row['is_buy'],
+                "instrument": row['instrument_id'],
+                "limit_price": key[2],
+                "amount": key[3],
+                "salt": str(salt),
+                "signature": signature,
+                "post_only": False,
+                "reduce_only": False,
+                "close_position": None,
+                "timestamp": timestamp,
+                'time_in_force': None,
+            }
+            orders[key] = (payload, order_id)
+        return orders
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.refresh_event.wait(), timeout=self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.refresh_event.clear()
+
+            candidate = self.candidate
+            if not candidate:
+                continue
+            if self.covers(candidate['instrument_id'], candidate['is_buy'], candidate['limit_price'], candidate['quantity']):
+                continue
+            try:
+                signed_at = time.time()
+                orders = await asyncio.to_thread(self.sign_ladder, candidate)
+                if self.candidate is None:
+                    continue
+                self.orders = orders
+                self.signed_at = signed_at
+                # the mark may have left the ladder while we were signing
+                current = self.candidate
+                if not self.covers(current['instrument_id'], current['is_buy'], current['limit_price'], current['quantity']):
+                    self.refresh_event.set()
+            except Exception as e:
+                logger.error(f"Error pre-signing aevo orders: {e}")
+                logger.error(traceback.format_exc())
@@ -38,11 +38,13 @@ async def process_tasks(amount:float) -> List[asyncio.Task]:
     return [deposit_task]
 
 
-async def aevo_deposit(amount:float) -> None:
+async def aevo_deposit(amount:float):
+    """Deposits ``amount``, returns the receipt or None if the deposit wasn't made."""
     tasks = []
     tasks.extend(await process_tasks(amount=amount))
 
-    await gather(*tasks)
+    results = await gather(*tasks)
+    return results[0]
 
 
 if __name__ == '__main__':
@@ -1,5 +1,5 @@
 from aiohttp import ClientSession
-from asyncio import sleep
+from asyncio import gather, sleep, to_thread
 import random
 import time
 
@@ -13,6 +13,9 @@ from typing import (
 from eth_account.datastructures import SignedMessage
 from web3.contract import Contract
 from loguru import logger
+from fee_oracle import get_fee_oracle
+from multicall import get_reader
+from web3_pool import get_contract
 
 from ...src.client.utils import approve_token
 from ...src.bot.trading_bot import Trader
@@ -53,7 +56,7 @@ class Aevo(Trader):
             contract_address: str = AEVO_CONTRACT,
             abi: str = AEVO_ABI,
     ) -> Contract:
-        return self.web3.eth.contract(address=contract_address, abi=abi)
+        return get_contract(self.web3, contract_address, abi)
 
     @staticmethod
     async def __get_instrument_id(token: str) -> tuple[int, int]:
@@ -83,7 +86,8 @@ class Aevo(Trader):
 
         return float(response_text['balance'])
 
-    async def deposit(self) -> None:
+    async def deposit(self):
+        """Deposits into the bridge, returns the receipt or None when no deposit was made."""
         eth_balance = await self.get_wallet_balance('ETH')
         if eth_balance == 0:
             logger.error(f'Your ETH balance is 0. [{self.wallet_address}]')
@@ -103,31 +107,56 @@ class Aevo(Trader):
         amount = amount[:3] + '0' * (len(amount) - 3)
         amount = int(amount)
 
-        await approve_token(amount, self.private_key, USDC_CONTRACT,
-                            self.contract.address, self.wallet_address, self.web3)
-
-        tx = await self.contract.functions.depositToAppChain(
+        connector = self.web3.to_checksum_address('0x69Adf49285c25d9f840c577A0e3cb134caF944D3')
+        # skipped when the allowance read with the balances covers it, otherwise sent
+        # without waiting and the deposit takes the next nonce
+        try:
+            approve_hash = await approve_token(amount, self.private_key, USDC_CONTRACT,
+                                               self.contract.address, self.wallet_address, self.web3, wait=False)
+        except Exception as ex:
+            # the deposit would only revert without the allowance
+            logger.error(f'Deposit aborted, the approve was not sent | {ex}')
+            return
+        msg_gas_limit = 1000000
+        function = self.contract.functions.depositToAppChain(
             self.wallet_address,
             amount,
-            1000000,
-            self.web3.to_checksum_address('0x69Adf49285c25d9f840c577A0e3cb134caF944D3'),
-        ).build_transaction({
+            msg_gas_limit,
+            connector,
+        )
+
+        oracle = get_fee_oracle(self.web3.provider.endpoint_uri)
+        tx_params = {
             'from': self.wallet_address,
             'value': self.web3.to_wei(random.uniform(0.0017, 0.0018), 'ether'),
-            'nonce': await self.web3.eth.get_transaction_count(self.wallet_address),
-            'gas': 0
-        })
-
-        tx.update({'maxFeePerGas': await self.web3.eth.gas_price})
-        tx.update({'maxPriorityFeePerGas': await self.web3.eth.gas_price})
-        gas_limit = await self.web3.eth.estimate_gas(tx)
-        fee = await self.__get_deposit_fee(gas_limit)
+            'gas': 0,
+            **await to_thread(oracle.fees),
+        }
+
+        # the bridge fee pays for the message gas the deposit asks for, not for this transaction's gas
+        gas_limit = oracle.cached_gas_limit({'to': self.contract.address, 'data': function.selector})
+        if gas_limit is not None:
+            # the chain id read by build_transaction and the bridge fee go out in one batch
+            tx, fee = await gather(function.build_transaction(tx_params), self.__get_deposit_fee(msg_gas_limit))
+        else:
+            # the first deposit can't be estimated before its approve is mined
+            receipts = [self.wait_for_receipt(approve_hash)] if approve_hash else []
+            tx, fee, *_ = await gather(function.build_transaction(tx_params), self.__get_deposit_fee(msg_gas_limit), *receipts)
+            gas_limit = await oracle.gas_limit_async(self.web3, tx)
         tx.update({'value': int(fee * 1.1)})
         tx.update({'gas': gas_limit})
         tx_hash = await self.sign_transaction(tx)
+        receipt = await self.wait_for_receipt(tx_hash)
+        oracle.observe(receipt, tx)
+        # the cached balances are from before the deposit
+        get_reader(self.web3).invalidate(self.wallet_address)
+        if receipt['status'] != 1:
+            logger.error(f'Deposit failed | TX: https://arbiscan.io/tx/{tx_hash}')
+            return
         logger.success(
             f'Successfully deposited {amount / 10 ** 6} USDC tokens | TX: https://arbiscan.io/tx/{tx_hash}'
         )
+        return receipt
 
     async def __get_deposit_fee(self, msg_gas_limit: int) -> Awaitable[int]:
         return await self.contract.functions.getMinFees(
@@ -292,6 +321,7 @@ class Aevo(Trader):
             evm_balance: int
     ) -> None:
         balance_before_withdraw = evm_balance
+        start_block = await self.web3.eth.block_number
         salt = random.randint(0, 10 ** 10)
         amount = int(amount * 10 ** 6)
         socket_fees = random.randint(4326304606198636, 4326309606198636)
@@ -322,7 +352,7 @@ class Aevo(Trader):
             return
 
         logger.success(f'Successfully withdrawn {amount / 10 ** 6} USDC')
-        await self.wait_for_withdraw(balance_before_withdraw, 'USDC')
+        await self.wait_for_withdraw(balance_before_withdraw, 'USDC', since_block=start_block)
 
     async def delete_api_keys(
             self,
@@ -1,18 +1,19 @@
 import time
 
-from eth_account.messages import encode_structured_data
 from eth_account.datastructures import SignedMessage
 from eth_account import Account
 from eth_abi import encode
 from web3 import AsyncWeb3
 
-from ...eip712_structs import (
-    make_domain,
-    Address,
+from ...eip712_structs import Address
+from .typed_data import (
+    ORDER,
+    REGISTER,
+    SIGN_KEY,
+    TRANSFER,
+    WITHDRAW,
 )
 
-from ....src.aevo.order import Order
-
 
 def get_signatures(
         web3: AsyncWeb3,
@@ -23,55 +24,18 @@ def get_signatures(
     signing_key = new_acc.address
     signing_private = new_acc.key.hex()
 
-    register_data = {
-        "name": "Aevo Mainnet",
-        "version": "1",
-        "chainId": 1
-    }
-    register_types = {
-        "EIP712Domain": [
-            {"name": "name", "type": "string"},
-            {"name": "version", "type": "string"},
-            {"name": "chainId", "type": "uint256"}
-        ],
-        "Register": [
-            {"name": "key", "type": "address"},
-            {"name": "expiry", "type": "uint256"}
-        ],
-
-    }
-    register_values = {
-        "key": signing_key,
-        "expiry": int(time.time() + 10000)
-    }
-    register_structured_data = {
-        "types": register_types,
-        "primaryType": "Register",
-        "domain": register_data,
-        "message": register_values
-    }
-
-    msg = encode_structured_data(register_structured_data)
-    account_signature = account.sign_message(msg).signature.hex()
-
-    signing_key_signature = web3.eth.account.sign_typed_data(
-        domain_data={
-            "name": "Aevo Mainnet",
-            "version": "1",
-            "chainId": 1,
-        },
-        message_types={
-            "SignKey": [
-                {"name": "account", "type": "address"}
-            ]
-        },
-        message_data={
-            "account": wallet_address
-        },
-        private_key=signing_private
+    account_signature = REGISTER.sign(
+        account.key,
+        1,
+        key=signing_key,
+        expiry=int(time.time() + 10000)
+    )
 
+    signing_key_signature = SIGN_KEY.sign(
+        signing_private,
+        1,
+        account=wallet_address
     )
-    signing_key_signature = signing_key_signature.signature.hex()
 
     return signing_key, account_signature, signing_key_signature
 
@@ -92,35 +56,16 @@ def sign_withdraw(
         [socket_fees, socket_msg_gas_limit, socket_connector]
     )
 
-    key_signature = web3.eth.account.sign_typed_data(
-        domain_data={
-            "name": "Aevo Mainnet",
-            "version": "1",
-            "chainId": 42161,
-        },
-        message_types={
-            "Withdraw": [
-                {"name": "collateral", "type": "address"},
-                {"name": "to", "type": "address"},
-                {"name": "amount", "type": "uint256"},
-                {"name": "salt", "type": "uint256"},
-                {"name": "data", "type": "bytes32"}
-            ]
-        },
-        message_data={
-            "collateral": web3.to_checksum_address(collateral),
-            "to": web3.to_checksum_address(to),
-            "amount": str(amount),
-            "salt": str(salt),
-            "data": web3.keccak(data)
-        },
-        private_key=private_key
-
+    return WITHDRAW.sign(
+        private_key,
+        42161,
+        collateral=collateral,
+        to=to,
+        amount=int(amount),
+        salt=int(salt),
+        data=web3.keccak(data)
     )
 
-    signature = key_signature.signature.hex()
-    return signature
-
 
 def sign_staking_withdraw(
         web3: AsyncWeb3,
@@ -130,33 +75,15 @@ def sign_staking_withdraw(
         amount: int,
         salt: int
 ) -> str:
-    key_signature = web3.eth.account.sign_typed_data(
-        domain_data={
-            "name": "Aevo Mainnet",
-            "version": "1",
-            "chainId": 1,
-        },
-        message_types={
-            "Transfer": [
-                {"name": "collateral", "type": "address"},
-                {"name": "to", "type": "address"},
-                {"name": "amount", "type": "uint256"},
-                {"name": "salt", "type": "uint256"}
-            ]
-        },
-        message_data={
-            "collateral": web3.to_checksum_address(collateral),
-            "to": web3.to_checksum_address(to),
-            "amount": str(amount),
-            "salt": str(salt),
-        },
-        private_key=private_key
-
+    return TRANSFER.sign(
+        private_key,
+        1,
+        collateral=collateral,
+        to=to,
+        amount=int(amount),
+        salt=int(salt)
     )
 
-    signature = key_signature.signature.hex()
-    return signature
-
 
 def sign_staking(
         web3: AsyncWeb3,
@@ -166,33 +93,15 @@ def sign_staking(
         amount: int,
         salt: int
 ) -> str:
-    key_signature = web3.eth.account.sign_typed_data(
-        domain_data={
-            "name": "Aevo Mainnet",
-            "version": "1",
-            "chainId": 42161,
-        },
-        message_types={
-            "Transfer": [
-                {"name": "collateral", "type": "address"},
-                {"name": "to", "type": "address"},
-                {"name": "amount", "type": "uint256"},
-                {"name": "salt", "type": "uint256"}
-            ]
-        },
-        message_data={
-            "collateral": web3.to_checksum_address(collateral),
-            "to": web3.to_checksum_address(to),
-            "amount": str(amount),
-            "salt": str(salt),
-        },
-        private_key=private_key
-
+    return TRANSFER.sign(
+        private_key,
+        42161,
+        collateral=collateral,
+        to=to,
+        amount=int(amount),
+        salt=int(salt)
     )
 
-    signature = key_signature.signature.hex()
-    return signature
-
 
 def sign_order(
         wallet_address: Address,
@@ -204,7 +113,9 @@ def sign_order(
         timestamp: float,
         instrument_id: int
 ) -> SignedMessage:
-    order_struct = Order(
+    return ORDER.sign(
+        private_key,
+        1,
         maker=wallet_address,
         isBuy=is_buy,
         limitPrice=int(limit_price),
@@ -213,7 +124,3 @@ def sign_order(
         instrument=instrument_id,
         timestamp=int(timestamp)
     )
-
-    domain = make_domain(name='Aevo Mainnet', version='1', chainId=1)
-    signable_bytes = AsyncWeb3.keccak(order_struct.signable_bytes(domain=domain))
-    return Account._sign_hash(signable_bytes, private_key).signature.hex()
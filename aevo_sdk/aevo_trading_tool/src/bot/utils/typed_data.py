@@ -0,0 +1,115 @@
+from eth_account import Account
+from eth_utils.crypto import keccak
+
+from ...eip712_structs import (
+    EIP712Struct,
+    from_solidity_type,
+    make_domain,
+)
+
+AEVO_DOMAIN_NAME = "Aevo Mainnet"
+AEVO_DOMAIN_VERSION = "1"
+
+
+class TypedDataSchema:
+    """A typed-data message type compiled once into an EIP712Struct.
+
+    The struct caches its encoded type and type hash, and the Aevo domain separator is
+    cached per chainId, so signing only encodes the field values.
+    """
+
+    def __init__(self, primary_type: str, fields: list[tuple[str, str]]) -> None:
+        self.primary_type = primary_type
+        self.fields = fields
+        self.struct = type(
+            primary_type,
+            (EIP712Struct,),
+            {name: from_solidity_type(solidity_type) for name, solidity_type in fields},
+        )
+        self.domain_separators = {}
+
+    @property
+    def type_hash(self) -> bytes:
+        return self.struct.type_hash()
+
+    def domain_separator(self, chain_id: int) -> bytes:
+        separator = self.domain_separators.get(chain_id)
+        if separator is None:
+            separator = make_domain(
+                name=AEVO_DOMAIN_NAME, version=AEVO_DOMAIN_VERSION, chainId=chain_id
+            ).hash_struct()
+            self.domain_separators[chain_id] = separator
+        return separator
+
+    def row(self, values: dict) -> tuple:
+        return tuple(values[name] for name, _ in self.fields)
+
+    def hash(self, chain_id: int, **values) -> bytes:
+        """The EIP-712 digest, keccak(0x1901 || domain separator || hash_struct)."""
+        struct_hash = self.struct.hash_structs([self.row(values)])[0]
+        return keccak(b"\x19\x01" + self.domain_separator(chain_id) + struct_hash)
+
+    def hash_many(self, chain_id: int, rows: list[dict]) -> list[bytes]:
+        separator = b"\x19\x01" + self.domain_separator(chain_id)
+        struct_hashes = self.struct.hash_structs([self.row(values) for values in rows])
+        return [keccak(separator + struct_hash) for struct_hash in struct_hashes]
+
+    def sign(self, private_key: str, chain_id: int, **values) -> str:
+        return Account._sign_hash(self.hash(chain_id, **values), private_key).signature.hex()
+
+    def sign_many(self, private_key: str, chain_id: int, rows: list[dict]) -> list[str]:
+        return [
+            Account._sign_hash(digest, private_key).signature.hex()
+            for digest in self.hash_many(chain_id, rows)
+        ]
+
+
+WITHDRAW = TypedDataSchema(
+    "Withdraw",
+    [
+        ("collateral", "address"),
+        ("to", "address"),
+        ("amount", "uint256"),
+        ("salt", "uint256"),
+        ("data", "bytes32"),
+    ],
+)
+TRANSFER = TypedDataSchema(
+    "Transfer",
+    [
+        ("collateral", "address"),
+        ("to", "address"),
+        ("amount", "uint256"),
+        ("salt", "uint256"),
+    ],
+)
+REGISTER = TypedDataSchema(
+    "Register",
+    [
+        ("key", "address"),
+        ("expiry", "uint256"),
+    ],
+)
+SIGN_KEY = TypedDataSchema(
+    "SignKey",
+    [
+        ("account", "address"),
+    ],
+)
+ORDER = TypedDataSchema(
+    "Order",
+    [
+        ("maker", "address"),
+        ("isBuy", "bool"),
+        ("limitPrice", "uint256"),
+        ("amount", "uint256"),
+        ("salt", "uint256"),
+        ("instrument", "uint256"),
+        ("timestamp", "uint256"),
+    ],
+)
+
+SCHEMAS = {
+    schema.primary_type: schema
+    for schema in (WITHDRAW, TRANSFER, REGISTER, SIGN_KEY, ORDER)
+}
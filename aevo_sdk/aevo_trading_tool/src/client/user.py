@@ -1,16 +1,22 @@
-from asyncio import sleep
+from asyncio import (
+    TimeoutError,
+    sleep,
+)
 
 from web3.types import TxParams
-from web3.eth import AsyncEth
+from eth_typing import HexStr
 from hexbytes import HexBytes
 from loguru import logger
 
-from web3 import AsyncWeb3
+from arrival_watcher import ArrivalWatcher
+from multicall import WalletState, get_reader
+from nonce_manager import get_nonce_manager
+from web3_pool import get_async_web3
 from ...config import RPC
 
 from ...src.data import (
     USDC_CONTRACT,
-    ERC20_ABI,
+    AEVO_CONTRACT,
 )
 
 
@@ -18,37 +24,53 @@ class User:
     def __init__(self, private_key: str) -> None:
         self.private_key = private_key
 
-        self.web3 = AsyncWeb3(
-            provider=AsyncWeb3.AsyncHTTPProvider(
-                endpoint_uri=RPC,
-            ),
-            modules={'eth': (AsyncEth,)},
-            middlewares=[]
-        )
+        self.web3 = get_async_web3(RPC)
         self.account = self.web3.eth.account.from_key(private_key)
         self.wallet_address = self.account.address
 
+    async def wallet_state(self, stable_address: str = USDC_CONTRACT, min_block: int = 0) -> WalletState:
+        # eth, the stables and the bridge allowance come back in one call, a deposit needs all of them
+        reader = get_reader(self.web3)
+        stable_address = self.web3.to_checksum_address(stable_address)
+        tokens = reader.tokens if stable_address in reader.tokens else reader.tokens + (stable_address,)
+        return await reader.read_async(self.wallet_address, tokens=tokens,
+                                       spenders=((USDC_CONTRACT, AEVO_CONTRACT),), min_block=min_block)
+
     async def get_wallet_balance(self, token: str = 'USDC', stable_address: str = USDC_CONTRACT) -> int:
+        state = await self.wallet_state(stable_address)
         if token.lower() != 'eth':
-            contract = self.web3.eth.contract(address=self.web3.to_checksum_address(stable_address),
-                                              abi=ERC20_ABI)
-            balance = await contract.functions.balanceOf(self.wallet_address).call()
-        else:
-            balance = await self.web3.eth.get_balance(self.wallet_address)
-
-        return balance
+            return state.balances[self.web3.to_checksum_address(stable_address)]
+        return state.eth
 
     async def sign_transaction(self, tx: TxParams) -> HexBytes:
-        signed_tx = self.web3.eth.account.sign_transaction(tx, self.private_key)
-        raw_tx_hash = await self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        # nonces are counted locally so transactions can be sent back to back
+        nonces = get_nonce_manager(RPC, self.wallet_address)
+        raw_tx_hash = await nonces.send_async(self.web3, tx, self.private_key)
         tx_hash = self.web3.to_hex(raw_tx_hash)
         return tx_hash
 
-    async def wait_for_withdraw(self, balance_before_withdraw: int, token: str) -> None:
+    async def wait_for_receipt(self, tx_hash: HexStr):
+        # a receipt that never comes makes the nonce count read from the chain again
+        return await get_nonce_manager(RPC, self.wallet_address).wait_async(self.web3, tx_hash)
+
+    async def wait_for_withdraw(self, balance_before_withdraw: int, token: str, since_block: int = None) -> None:
         logger.info(f'Waiting for {token.upper()} to arrive on Metamask...')
+        # eth moves without logs, and without a start block there is nothing to scan from
+        watcher = None
+        if token.lower() != 'eth' and since_block is not None:
+            watcher = ArrivalWatcher(self.web3, self.wallet_address, tokens=(USDC_CONTRACT,))
+        min_block = 0
         while True:
-            balance = await self.get_wallet_balance(token)
+            state = await self.wallet_state(min_block=min_block)
+            balance = state.eth if token.lower() == 'eth' else state.balances[self.web3.to_checksum_address(USDC_CONTRACT)]
             if balance > balance_before_withdraw:
                 logger.success(f'{token.upper()} has arrived | [{self.wallet_address}]')
                 break
-            await sleep(20)
+            if watcher is None:
+                await sleep(20)
+                continue
+            try:
+                transfers = await watcher.wait_for(since_block=since_block, timeout=20)
+                min_block = since_block = max(transfer.block_number for transfer in transfers)
+            except TimeoutError:
+                pass
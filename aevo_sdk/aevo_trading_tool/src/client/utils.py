@@ -1,6 +1,6 @@
 from typing import Optional
 from random import uniform
-from asyncio import sleep
+from asyncio import gather, to_thread
 
 from ..eip712_structs import Address
 from web3.contract import Contract
@@ -8,6 +8,10 @@ from web3.types import TxParams
 from eth_typing import HexStr
 from web3 import AsyncWeb3
 from loguru import logger
+from fee_oracle import get_fee_oracle
+from multicall import get_reader
+from nonce_manager import get_nonce_manager
+from web3_pool import get_contract
 
 from ...src.data import ERC20_ABI
 
@@ -18,48 +22,61 @@ async def approve_token(
         from_token_address: str,
         spender: str,
         address_wallet: Address,
-        web3: AsyncWeb3
+        web3: AsyncWeb3,
+        wait: bool = True
 ) -> Optional[HexStr]:
+    """Approves ``spender`` if the allowance is short and returns the approve hash.
+
+    With ``wait=False`` it returns as soon as the approve is sent, the caller's next transaction
+    takes the following nonce and can go out straight after it. A failure then raises instead of
+    returning None, since None means no approve was needed and the caller would send regardless.
+    """
     try:
         spender = web3.to_checksum_address(spender)
         contract = load_contract(from_token_address, web3, ERC20_ABI)
         allowance_amount = await check_allowance(web3, from_token_address, address_wallet, spender)
+        if allowance_amount is None:
+            raise ValueError(f'Could not read the allowance of {spender}')
 
         if amount > allowance_amount:
             logger.debug('🛠️ | Approving token...')
-            tx = await contract.functions.approve(
-                spender,
-                int(amount * 2)
-            ).build_transaction(
-                {
-                    'chainId': await web3.eth.chain_id,
-                    'from': address_wallet,
-                    'nonce': await web3.eth.get_transaction_count(address_wallet),
-                    'gasPrice': 0,
-                    'gas': 0,
-                    'value': 0
-                }
+            tx = {
+                'from': address_wallet,
+                'to': contract.address,
+                'data': contract.encodeABI(fn_name='approve', args=[spender, int(amount * 2)]),
+                'value': 0
+            }
+
+            # none of these depend on each other, the chain id and estimate go out in one batch
+            chain_id, gas_price, gas_limit = await gather(
+                web3.eth.chain_id,
+                add_gas_price(web3),
+                add_gas_limit(web3, tx),
             )
+            tx.update({'chainId': chain_id, 'gasPrice': gas_price, 'gas': gas_limit})
 
-            gas_price = await add_gas_price(web3)
-            tx['gasPrice'] = gas_price
-
-            gas_limit = await add_gas_limit(web3, tx)
-            tx['gas'] = gas_limit
-
-            signed_tx = web3.eth.account.sign_transaction(tx, private_key=private_key)
-            raw_tx_hash = await web3.eth.send_raw_transaction(signed_tx.rawTransaction)
-            tx_receipt = await web3.eth.wait_for_transaction_receipt(raw_tx_hash)
-            while tx_receipt is None:
-                await sleep(1)
-                tx_receipt = web3.eth.get_transaction_receipt(raw_tx_hash)
+            nonces = get_nonce_manager(web3.provider.endpoint_uri, address_wallet)
+            raw_tx_hash = await nonces.send_async(web3, tx, private_key)
             tx_hash = web3.to_hex(raw_tx_hash)
+            get_reader(web3).invalidate(address_wallet)
+            oracle = get_fee_oracle(web3.provider.endpoint_uri)
+            if not wait:
+                # its gas is checked once it is mined
+                oracle.watch(web3, raw_tx_hash, tx)
+                logger.success('✔️ | Token approve sent')
+                return tx_hash
+            tx_receipt = await nonces.wait_async(web3, raw_tx_hash)
+            oracle.observe(tx_receipt, tx)
+            if tx_receipt['status'] != 1:
+                logger.error(f'Approve failed | TX: {tx_hash}')
+                return
             logger.success(f'✔️ | Token approved')
-            await sleep(5)
             return tx_hash
 
     except Exception as ex:
         logger.error(f'Something went wrong | {ex}')
+        if not wait:
+            raise
 
 
 async def check_allowance(
@@ -69,10 +86,10 @@ async def check_allowance(
         spender: str
 ) -> Optional[int]:
     try:
-        contract = web3.eth.contract(address=web3.to_checksum_address(from_token_address),
-                                     abi=ERC20_ABI)
-        amount_approved = await contract.functions.allowance(address_wallet, spender).call()
-        return amount_approved
+        from_token_address = web3.to_checksum_address(from_token_address)
+        spender = web3.to_checksum_address(spender)
+        state = await get_reader(web3).read_async(address_wallet, spenders=((from_token_address, spender),))
+        return state.allowances[(from_token_address, spender)]
 
     except Exception as ex:
         logger.error(f'Something went wrong | {ex}')
@@ -86,15 +103,15 @@ def load_contract(
     if address is None:
         return
 
-    address = web3.to_checksum_address(address)
-    return web3.eth.contract(address=address, abi=abi)
+    return get_contract(web3, address, abi)
 
 
 async def add_gas_price(
         web3: AsyncWeb3
 ) -> Optional[int]:
     try:
-        gas_price = await web3.eth.gas_price
+        # sampled in the background, only blocks when the last sample is stale
+        gas_price = await to_thread(get_fee_oracle(web3.provider.endpoint_uri).gas_price)
         gas_price = int(gas_price * uniform(1.01, 1.02))
         return gas_price
     except Exception as ex:
@@ -106,5 +123,5 @@ async def add_gas_limit(
         tx: TxParams
 ) -> int:
     tx['value'] = 0
-    gas_limit = await web3.eth.estimate_gas(tx)
+    gas_limit = await get_fee_oracle(web3.provider.endpoint_uri).gas_limit_async(web3, tx)
     return gas_limit
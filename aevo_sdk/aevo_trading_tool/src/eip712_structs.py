@@ -12,11 +12,15 @@ from collections import OrderedDict, defaultdict
 from json import JSONEncoder
 from typing import Any, List, NamedTuple, Tuple, Type, Union
 
+from Crypto.Hash import keccak as keccak_hash
 from eth_utils.conversions import to_bytes, to_hex, to_int
 from eth_utils.crypto import keccak
 
 default_domain = None
 
+# Zero padding for the in-place encoders, sliced through a memoryview so no copy is made
+ZERO_WORD = memoryview(bytes(32))
+
 
 class EIP712Type:
     """The base type for members of a struct.
@@ -39,6 +43,18 @@ class EIP712Type:
         else:
             return self._encode_value(value)
 
+    def encode_into(self, value, buffer, offset: int) -> int:
+        """Write the encoded value into ``buffer`` (a bytearray or writable memoryview) at ``offset``.
+
+        The 32 bytes written are identical to ``encode_value(value)``.
+
+        :return: The offset just past the written word
+        """
+        if value is None:
+            value = self.none_val
+        self._encode_into(value, buffer, offset)
+        return offset + 32
+
     def _encode_value(self, value) -> bytes:
         """Must be implemented by subclasses, handles value encoding on a case-by-case basis.
 
@@ -46,6 +62,10 @@ class EIP712Type:
         """
         pass
 
+    def _encode_into(self, value, buffer, offset: int):
+        """Subclasses with a fixed-width encoding override this to skip the intermediate bytes."""
+        buffer[offset : offset + 32] = self._encode_value(value)
+
     def __eq__(self, other):
         self_type = getattr(self, "type_name")
         other_type = getattr(other, "type_name")
@@ -87,6 +107,7 @@ class Address(EIP712Type):
     def __init__(self):
         """Represents an ``address`` type."""
         super(Address, self).__init__("address", 0)
+        self.uint = Uint(160)
 
     def _encode_value(self, value):
         """Addresses are encoded like Uint160 numbers."""
@@ -100,11 +121,34 @@ class Address(EIP712Type):
             v = value  # Fallback, just use it as-is.
         return Uint(160).encode_value(v)
 
+    def _encode_into(self, value, buffer, offset: int):
+        # A 20 byte address is written as is behind 12 zero bytes, anything else goes through the Uint160 path
+        if isinstance(value, str):
+            digits = value[2:] if value[:2] in ("0x", "0X") else value
+            address = bytes.fromhex(digits) if len(digits) == 40 else None
+        elif isinstance(value, bytes):
+            address = value
+        else:
+            address = None
+        if address is not None and len(address) == 20:
+            buffer[offset : offset + 12] = ZERO_WORD[:12]
+            buffer[offset + 12 : offset + 32] = address
+        elif isinstance(value, (str, bytes)):
+            self.uint._encode_into(
+                to_int(value) if isinstance(value, bytes) else to_int(hexstr=value),
+                buffer,
+                offset,
+            )
+        else:
+            self.uint._encode_into(value, buffer, offset)
+
 
 class Boolean(EIP712Type):
     def __init__(self):
         """Represents a ``bool`` type."""
         super(Boolean, self).__init__("bool", False)
+        self.false_word = bytes(32)
+        self.true_word = (1).to_bytes(32, byteorder="big")
 
     def _encode_value(self, value):
         """Booleans are encoded like the uint256 values of 0 and 1."""
@@ -115,6 +159,14 @@ class Boolean(EIP712Type):
         else:
             raise ValueError(f"Must be True or False. Got: {value}")
 
+    def _encode_into(self, value, buffer, offset: int):
+        if value is False:
+            buffer[offset : offset + 32] = self.false_word
+        elif value is True:
+            buffer[offset : offset + 32] = self.true_word
+        else:
+            raise ValueError(f"Must be True or False. Got: {value}")
+
 
 class Bytes(EIP712Type):
     def __init__(self, length: int = 0):
@@ -154,6 +206,19 @@ class Bytes(EIP712Type):
             padding = bytes(32 - len(value))
             return value + padding
 
+    def _encode_into(self, value, buffer, offset: int):
+        if self.length == 0:
+            # Dynamic bytes are hashed, there is nothing to gain from writing in place
+            buffer[offset : offset + 32] = self._encode_value(value)
+            return
+        if isinstance(value, str):
+            value = to_bytes(hexstr=value)
+        if len(value) > self.length:
+            raise ValueError(f"{self.type_name} was given bytes with length {len(value)}")
+        end = offset + len(value)
+        buffer[offset:end] = value
+        buffer[end : offset + 32] = ZERO_WORD[len(value) :]
+
 
 class Int(EIP712Type):
     def __init__(self, length: int = 256):
@@ -203,6 +268,7 @@ class Uint(EIP712Type):
                 f"Uint length must be a multiple of 8, between 8 and 256. Got: {length}"
             )
         self.length = length
+        self.width = length // 8
         super(Uint, self).__init__(f"uint{length}", 0)
 
     def _encode_value(self, value: int):
@@ -212,6 +278,13 @@ class Uint(EIP712Type):
         )  # For validation
         return value.to_bytes(32, byteorder="big", signed=False)
 
+    def _encode_into(self, value: int, buffer, offset: int):
+        # Encoding at the member's own width validates the range, the rest of the word is zero padding
+        start = offset + 32 - self.width
+        encoded = value.to_bytes(self.width, byteorder="big", signed=False)
+        buffer[offset:start] = ZERO_WORD[: 32 - self.width]
+        buffer[start : offset + 32] = encoded
+
 
 # This helper dict maps solidity's type names to our EIP712Type classes
 solidity_type_map = {
@@ -266,6 +339,18 @@ class OrderedAttributesMeta(type):
     def __prepare__(mcs, name, bases):
         return OrderedDict()
 
+    def __setattr__(cls, name, value):
+        """Members added after class creation (see ``make_domain`` and ``from_message``) refresh the frozen layout."""
+        super().__setattr__(name, value)
+        if _is_member(value) and "_members" in cls.__dict__:
+            cls._freeze_layout()
+
+
+def _is_member(value) -> bool:
+    return isinstance(value, EIP712Type) or (
+        isinstance(value, type) and issubclass(value, EIP712Struct)
+    )
+
 
 class EIP712Struct(EIP712Type, metaclass=OrderedAttributesMeta):
     """A representation of an EIP712 struct. Subclass it to use it.
@@ -279,20 +364,64 @@ class EIP712Struct(EIP712Type, metaclass=OrderedAttributesMeta):
         struct_instance = MyStruct(some_param='some_value')
     """
 
+    # Frozen per class by _freeze_layout. Instances keep their values in a list in member order.
+    _members: Tuple[Tuple[str, EIP712Type], ...] = ()
+    _member_index: dict = {}
+    _struct_members: Tuple[bool, ...] = ()
+    _layout_version = 0
+    _type_dependencies: tuple = ()
+    _encoded_type = ""
+    _type_hash = b""
+    none_val = None
+
     def __init__(self, **kwargs):
-        super(EIP712Struct, self).__init__(self.type_name, None)
-        members = self.get_members()
-        self.values = dict()
-        for name, typ in members:
+        values = []
+        for name, typ in self._members:
             value = kwargs.get(name)
             if isinstance(value, dict):
                 value = typ(**value)
-            self.values[name] = value
+            values.append(value)
+        self._values = values
 
     @classmethod
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         cls.type_name = cls.__name__
+        cls._freeze_layout()
+
+    @classmethod
+    def _freeze_layout(cls):
+        """Scan the class once for its members and cache the encoded type and type hash."""
+        members = tuple(m for m in cls.__dict__.items() if _is_member(m[1]))
+        cls._members = members
+        cls._member_index = {name: i for i, (name, _) in enumerate(members)}
+        cls._struct_members = tuple(isinstance(typ, type) for _, typ in members)
+        cls._layout_version = cls._layout_version + 1
+        cls._freeze_type()
+
+    @classmethod
+    def _freeze_type(cls):
+        reference_structs = set()
+        cls._gather_reference_structs(reference_structs)
+        reference_structs.add(cls)
+        # A nested struct that gains members later changes our type too, so remember the versions we saw
+        cls._type_dependencies = tuple(
+            (struct, struct._layout_version) for struct in reference_structs
+        )
+        cls._encoded_type = cls._encode_type(True)
+        cls._type_hash = keccak(text=cls._encoded_type)
+
+    @classmethod
+    def _type_is_current(cls) -> bool:
+        return all(
+            struct._layout_version == version
+            for struct, version in cls._type_dependencies
+        )
+
+    @property
+    def values(self) -> dict:
+        """The struct's values keyed by member name, in member order."""
+        return {name: value for (name, _), value in zip(self._members, self._values)}
 
     def encode_value(self, value=None):
         """Returns the struct's encoded value.
@@ -302,25 +431,37 @@ class EIP712Struct(EIP712Type, metaclass=OrderedAttributesMeta):
 
         :param value: This parameter is not used for structs.
         """
-        encoded_values = list()
-        for name, typ in self.get_members():
-            if isinstance(typ, type) and issubclass(typ, EIP712Struct):
-                # Nested structs are recursively hashed, with the resulting 32-byte hash appended to the list of values
-                sub_struct = self.get_data_value(name)
-                encoded_values.append(sub_struct.hash_struct())
+        buffer = bytearray(32 * len(self._members))
+        self._encode_row(self._values, buffer, 0)
+        return bytes(buffer)
+
+    @classmethod
+    def _encode_row(cls, row, buffer, offset: int) -> int:
+        """Write the encoded member values of ``row`` into ``buffer`` at ``offset``, in member order."""
+        for (_, typ), is_struct, value in zip(cls._members, cls._struct_members, row):
+            if is_struct:
+                # Nested structs are recursively hashed, with the resulting 32-byte hash written in their place
+                if isinstance(value, dict):
+                    value = typ(**value)
+                buffer[offset : offset + 32] = value.hash_struct()
+                offset += 32
             else:
-                # Regular types are encoded as normal
-                encoded_values.append(typ.encode_value(self.values[name]))
-        return b"".join(encoded_values)
+                # Regular types are written in place
+                offset = typ.encode_into(value, buffer, offset)
+        return offset
 
     def get_data_value(self, name):
         """Get the value of the given struct parameter."""
-        return self.values.get(name)
+        index = self._member_index.get(name)
+        if index is None:
+            return None
+        return self._values[index]
 
     def set_data_value(self, name, value):
         """Set the value of the given struct parameter."""
-        if name in self.values:
-            self.values[name] = value
+        index = self._member_index.get(name)
+        if index is not None:
+            self._values[index] = value
 
     def data_dict(self):
         """Provide the entire data dictionary representing the struct.
@@ -328,7 +469,7 @@ class EIP712Struct(EIP712Type, metaclass=OrderedAttributesMeta):
         Nested structs instances are also converted to dict form.
         """
         result = dict()
-        for k, v in self.values.items():
+        for (k, _), v in zip(self._members, self._values):
             if isinstance(v, EIP712Struct):
                 result[k] = v.data_dict()
             else:
@@ -355,9 +496,9 @@ class EIP712Struct(EIP712Type, metaclass=OrderedAttributesMeta):
     def _gather_reference_structs(cls, struct_set):
         """Finds reference structs defined in this struct type, and inserts them into the given set."""
         structs = [
-            m[1]
-            for m in cls.get_members()
-            if isinstance(m[1], type) and issubclass(m[1], EIP712Struct)
+            typ
+            for (_, typ), is_struct in zip(cls._members, cls._struct_members)
+            if is_struct
         ]
         for struct in structs:
             if struct not in struct_set:
@@ -370,19 +511,52 @@ class EIP712Struct(EIP712Type, metaclass=OrderedAttributesMeta):
 
         Nested structs are also encoded, and appended in alphabetical order.
         """
-        return cls._encode_type(True)
+        if not cls._type_is_current():
+            cls._freeze_type()
+        return cls._encoded_type
 
     @classmethod
     def type_hash(cls) -> bytes:
         """Get the keccak hash of the struct's encoded type."""
-        return keccak(text=cls.encode_type())
+        if not cls._type_is_current():
+            cls._freeze_type()
+        return cls._type_hash
 
     def hash_struct(self) -> bytes:
         """The hash of the struct.
 
         hash_struct => keccak(type_hash || encode_data)
         """
-        return keccak(b"".join([self.type_hash(), self.encode_value()]))
+        buffer = bytearray(32 * (len(self._members) + 1))
+        buffer[:32] = self.type_hash()
+        self._encode_row(self._values, buffer, 32)
+        return keccak_hash.new(digest_bits=256, data=buffer).digest()
+
+    @classmethod
+    def hash_structs(cls, rows) -> List[bytes]:
+        """The ``hash_struct`` of many structs of this type.
+
+        Each row is a tuple of member values in definition order. Every row is encoded into one
+        buffer with a fixed stride of ``32 * (len(members) + 1)`` bytes, type hash first, and each
+        slice is hashed through a memoryview.
+        """
+        members = cls._members
+        type_hash = cls.type_hash()
+        stride = 32 * (len(members) + 1)
+        buffer = bytearray(stride * len(rows))
+        offset = 0
+        for row in rows:
+            if len(row) != len(members):
+                raise ValueError(
+                    f"{cls.type_name} has {len(members)} members, got a row of {len(row)} values"
+                )
+            buffer[offset : offset + 32] = type_hash
+            offset = cls._encode_row(row, buffer, offset + 32)
+        view = memoryview(buffer)
+        return [
+            keccak_hash.new(digest_bits=256, data=view[start : start + stride]).digest()
+            for start in range(0, len(buffer), stride)
+        ]
 
     @classmethod
     def get_members(cls) -> List[Tuple[str, EIP712Type]]:
@@ -390,13 +564,7 @@ class EIP712Struct(EIP712Type, metaclass=OrderedAttributesMeta):
 
         Each tuple is (<parameter_name>, <parameter_type>). The list's order is determined by definition order.
         """
-        members = [
-            m
-            for m in cls.__dict__.items()
-            if isinstance(m[1], EIP712Type)
-            or (isinstance(m[1], type) and issubclass(m[1], EIP712Struct))
-        ]
-        return members
+        return list(cls._members)
 
     @staticmethod
     def _assert_domain(domain):
@@ -526,15 +694,13 @@ class EIP712Struct(EIP712Type, metaclass=OrderedAttributesMeta):
 
     @classmethod
     def _assert_key_is_member(cls, key):
-        member_names = {tup[0] for tup in cls.get_members()}
-        if key not in member_names:
+        if key not in cls._member_index:
             raise KeyError(f'"{key}" is not defined for this struct.')
 
     @classmethod
     def _assert_property_type(cls, key, value):
         """Eagerly check for a correct member type"""
-        members = dict(cls.get_members())
-        typ = members[key]
+        typ = cls._members[cls._member_index[key]][1]
 
         if isinstance(typ, type) and issubclass(typ, EIP712Struct):
             # We expect an EIP712Struct instance. Assert that's true, and check the struct signature too.
@@ -557,14 +723,14 @@ class EIP712Struct(EIP712Type, metaclass=OrderedAttributesMeta):
     def __getitem__(self, key):
         """Provide access directly to the underlying value dictionary"""
         self._assert_key_is_member(key)
-        return self.values.__getitem__(key)
+        return self._values[self._member_index[key]]
 
     def __setitem__(self, key, value):
         """Provide access directly to the underlying value dictionary"""
         self._assert_key_is_member(key)
         self._assert_property_type(key, value)
 
-        return self.values.__setitem__(key, value)
+        self._values[self._member_index[key]] = value
 
     def __delitem__(self, _):
         raise TypeError("Deleting entries from an EIP712Struct is not allowed.")
@@ -587,7 +753,9 @@ class EIP712Struct(EIP712Type, metaclass=OrderedAttributesMeta):
         )
 
     def __hash__(self):
-        value_hashes = [hash(k) ^ hash(v) for k, v in self.values.items()]
+        value_hashes = [
+            hash(k) ^ hash(v) for (k, _), v in zip(self._members, self._values)
+        ]
         return functools.reduce(operator.xor, value_hashes, hash(self.type_name))
 
 
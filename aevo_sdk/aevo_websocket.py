@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 import aiohttp
 
 from .aevo import AevoLibClient  # Ensure aevo is accessible as a module
+from .aevo_order_gateway import AevoOrderGateway
+from .aevo_order_tracker import AevoOrderTracker
 
 class AevoWebSocket:
     def __init__(self, message_callback,coins):
@@ -37,6 +39,8 @@ class AevoWebSocket:
             api_secret=self.api_secret,
             env="mainnet",
         )
+        self.order_tracker = AevoOrderTracker()
+        self.order_gateway = AevoOrderGateway(self.aevo_client, order_tracker=self.order_tracker)
 
     async def start(self, coins):
         await self.aevo_client.open_connection()
@@ -58,9 +62,13 @@ class AevoWebSocket:
         if coin == 'pos':
             await self.aevo_client.subscribe_postitions()
             logger.info("subscribed to postitions")
+            await self.aevo_client.subscribe_orders()
+            await self.aevo_client.subscribe_fills()
+            logger.info("subscribed to orders and fills")
         else:
             coin = coin.replace('k', '1000')
             await self.aevo_client.subscribe_tickers(asset=coin, type='PERPETUAL')
+            await self.aevo_client.subscribe_orderbook(instrument_name=f"{coin}-PERP")
             logger.info(f"Subscribed to {coin}")
 
         while True:
@@ -70,13 +78,22 @@ class AevoWebSocket:
                 msg = json.loads(msg)
             except json.JSONDecodeError:
                 continue
+            if self.order_tracker.handle_message(msg):
+                continue
             await self.message_callback(msg)
     
+    async def resubscribe_orderbook(self, instrument_name):
+        await self.aevo_client.unsubscribe(f"orderbook:{instrument_name}")
+        await self.aevo_client.subscribe_orderbook(instrument_name=instrument_name)
+
     async def read_messages(self):
         try:
             async for msg in self.aevo_client.read_messages(on_disconnect=self.on_disconnect):
-                await self.message_queue.put(msg)
                 self.last_message_time = datetime.now()
+                # order acks resolve their futures here instead of waiting behind the market data queue
+                if self.order_gateway.handle_message(msg):
+                    continue
+                await self.message_queue.put(msg)
                 # logger.debug(f"Received message: {msg}")
         except Exception as e:
             logger.error(f"Error reading messages: {e}")
@@ -137,7 +154,7 @@ class AevoWebSocket:
         if is_buy:
             limit_price = 1000000
         # place market order
-        response = await self.aevo_client.create_order(
+        response = await self.order_gateway.place_order(
             instrument_id=instrument_id,
             is_buy=is_buy,
             quantity=quantity,
@@ -149,9 +166,10 @@ class AevoWebSocket:
         return response
     
     async def cancel_order(self,order_id):
-        order_id = await self.aevo_client.cancel_order(
+        future = await self.order_gateway.cancel_order(
         order_id=order_id,
     )
+        return await future
 
     async def stop(self):
         for task in self.tasks:
@@ -0,0 +1,133 @@
+import asyncio
+from collections import deque
+from typing import NamedTuple
+
+from eth_utils import keccak
+from loguru import logger
+from web3 import Web3
+
+TRANSFER_TOPIC = '0x' + keccak(text='Transfer(address,address,uint256)').hex()
+
+
+class Transfer(NamedTuple):
+    token: str
+    sender: str
+    amount: int
+    block_number: int
+    tx_hash: str
+    log_index: int
+
+
+class ArrivalWatcher:
+    """Resolves waiters as soon as an ERC-20 ``Transfer`` to ``owner`` lands.
+
+    Logs are read with an incremental ``eth_getLogs`` block cursor, so every poll only asks for
+    the blocks since the last one and the latency is about one poll, not one balance interval.
+    The poll loop only runs while someone is waiting. Plain ETH transfers emit no logs and
+    can't be watched here.
+    """
+
+    def __init__(self, web3, owner:str, tokens, poll_interval:float=1, max_range:int=2000, history:int=256) -> None:
+        self.web3 = web3
+        self.owner = Web3.to_checksum_address(owner)
+        self.owner_topic = '0x' + '00' * 12 + self.owner[2:].lower()
+        self.tokens = [Web3.to_checksum_address(token) for token in tokens]
+        self.poll_interval = poll_interval
+        self.max_range = max_range
+        self.first_block = None  # transfers are known from after this block
+        self.cursor = None  # up to and including this block
+        self.transfers = deque(maxlen=history)
+        self.waiters = []
+        self.task = None
+
+    async def block_number(self):
+        return await self.web3.eth.block_number
+
+    def decode(self, log):
+        return Transfer(
+            token=Web3.to_checksum_address(log['address']),
+            sender=Web3.to_checksum_address(bytes(log['topics'][1])[-20:]),
+            amount=int.from_bytes(bytes(log['data']), 'big'),
+            block_number=log['blockNumber'],
+            tx_hash=Web3.to_hex(log['transactionHash']),
+            log_index=log['logIndex'],
+        )
+
+    async def get_transfers(self, from_block, to_block):
+        transfers = []
+        while from_block <= to_block:
+            chunk_end = min(to_block, from_block + self.max_range - 1)
+            logs = await self.web3.eth.get_logs({
+                'fromBlock': from_block,
+                'toBlock': chunk_end,
+                'address': self.tokens,
+                'topics': [TRANSFER_TOPIC, None, self.owner_topic],
+            })
+            transfers += [self.decode(log) for log in logs]
+            from_block = chunk_end + 1
+        return transfers
+
+    async def backfill(self, since_block):
+        # a waiter asked about blocks from before the cursor started
+        if self.first_block is None:
+            self.first_block = self.cursor = since_block
+        elif since_block < self.first_block:
+            older = await self.get_transfers(since_block + 1, self.first_block)
+            room = self.transfers.maxlen - len(self.transfers)
+            if len(older) > room:
+                # keep the newest ones, and only whole blocks so first_block stays exact
+                since_block = older[len(older) - room - 1].block_number
+                older = [transfer for transfer in older if transfer.block_number > since_block]
+            self.transfers.extendleft(reversed(older))
+            self.first_block = since_block
+
+    async def scan(self):
+        latest = await self.block_number()
+        if self.cursor is not None and latest > self.cursor:
+            self.transfers.extend(await self.get_transfers(self.cursor + 1, latest))
+            self.cursor = latest
+        self.dispatch()
+
+    def dispatch(self):
+        for waiter in list(self.waiters):
+            token, since_block, min_amount, future = waiter
+            if future.done():
+                self.waiters.remove(waiter)
+                continue
+            arrived = [
+                transfer for transfer in self.transfers
+                if transfer.block_number > since_block and (token is None or transfer.token == token)
+            ]
+            if arrived and sum(transfer.amount for transfer in arrived) >= min_amount:
+                future.set_result(arrived)
+                self.waiters.remove(waiter)
+
+    async def run(self):
+        while self.waiters:
+            try:
+                await self.scan()
+            except Exception as e:
+                logger.info(f"Error reading transfer logs {e}")
+            if self.waiters:
+                await asyncio.sleep(self.poll_interval)
+        self.task = None
+
+    async def wait_for(self, token:str=None, since_block:int=None, min_amount:int=1, timeout:float=None):
+        """Waits for transfers of ``token`` (any watched token if None) after ``since_block``.
+
+        Returns the transfers once they add up to ``min_amount`` raw units, raises
+        ``asyncio.TimeoutError`` after ``timeout`` seconds.
+        """
+        if since_block is None:
+            since_block = await self.block_number()
+        await self.backfill(since_block)
+        token = Web3.to_checksum_address(token) if token else None
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append((token, since_block, min_amount, future))
+        self.dispatch()
+        if self.task is None and self.waiters:
+            self.task = asyncio.create_task(self.run())
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.waiters = [waiter for waiter in self.waiters if waiter[3] is not future]
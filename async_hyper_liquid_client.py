@@ -0,0 +1,198 @@
+import json
+import os
+import aiohttp
+from eth_account import Account
+from loguru import logger
+from dotenv import load_dotenv
+
+from hyperliquid.utils import constants
+from hyperliquid.utils.error import ClientError, ServerError
+from hyperliquid.utils.signing import (
+    get_timestamp_ms,
+    order_request_to_order_wire,
+    order_wires_to_order_action,
+    sign_l1_action,
+)
+
+from hyper_liquid_client import limit_order_request, order_statuses, tpsl_order_requests
+
+
+class AsyncHyperLiquidClient:
+    """Hyperliquid info and exchange calls on one shared aiohttp session.
+
+    Actions are built and signed with the SDK's own signing helpers, so the payloads posted to
+    ``/exchange`` are the ones ``hyperliquid.exchange.Exchange`` would send, without blocking the
+    event loop on ``requests``.
+    """
+
+    DEFAULT_SLIPPAGE = 0.05
+
+    def __init__(self, instruments=None, vault_address=None) -> None:
+        load_dotenv()
+        self.ADDRESS = os.environ.get('address')
+        self.SECRET_KEY = os.environ.get('private_key')
+        self.BASE_URL = constants.MAINNET_API_URL
+        self.ACCOUNT = Account.from_key(self.SECRET_KEY)
+        self.TAKER_FEE = 0.00035
+        self.MAKER_FEE = 0.0001
+        self.is_mainnet = self.BASE_URL == constants.MAINNET_API_URL
+        self.vault_address = vault_address
+        self.instruments = instruments  # optional InstrumentCache, saves a meta call for asset ids
+        self.coin_to_asset = {}
+        self.session = None
+
+    async def get_session(self):
+        # created lazily so it binds to the running loop
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=20, keepalive_timeout=60, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(
+                base_url=self.BASE_URL,
+                connector=connector,
+                headers={'Content-Type': 'application/json'},
+                timeout=aiohttp.ClientTimeout(total=10),
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def post(self, url_path, payload):
+        session = await self.get_session()
+        async with session.post(url_path, json=payload) as response:
+            text = await response.text()
+            if 400 <= response.status < 500:
+                # same errors the SDK's API.post raises
+                try:
+                    err = json.loads(text)
+                except json.JSONDecodeError:
+                    raise ClientError(response.status, None, text, None, response.headers)
+                if err is None:
+                    raise ClientError(response.status, None, text, None, response.headers)
+                raise ClientError(response.status, err['code'], err['msg'], response.headers, err.get('data'))
+            if response.status >= 500:
+                raise ServerError(response.status, text)
+            try:
+                return json.loads(text)
+            except ValueError:
+                return {'error': f'Could not parse JSON: {text}'}
+
+    ### info ###
+    async def user_state(self, address=None):
+        return await self.post('/info', {'type': 'clearinghouseState', 'user': address or self.ADDRESS})
+
+    async def meta_and_asset_ctxs(self):
+        return await self.post('/info', {'type': 'metaAndAssetCtxs'})
+
+    async def all_mids(self):
+        return await self.post('/info', {'type': 'allMids'})
+
+    async def asset(self, coin):
+        if coin not in self.coin_to_asset:
+            hyper_asset = self.instruments.hyper_asset(coin) if self.instruments else None
+            if hyper_asset:
+                self.coin_to_asset[coin] = hyper_asset['asset']
+            else:
+                meta = await self.post('/info', {'type': 'meta'})
+                self.coin_to_asset = {asset_info['name']: asset for asset, asset_info in enumerate(meta['universe'])}
+        return self.coin_to_asset[coin]
+
+    ### exchange ###
+    async def post_action(self, action):
+        nonce = get_timestamp_ms()
+        signature = sign_l1_action(self.ACCOUNT, action, self.vault_address, nonce, self.is_mainnet)
+        payload = {
+            'action': action,
+            'nonce': nonce,
+            'signature': signature,
+            'vaultAddress': self.vault_address,
+        }
+        return await self.post('/exchange', payload)
+
+    async def bulk_orders(self, order_requests, grouping='na'):
+        """One signed order action for all of ``order_requests``, see HyperLiquidClient.bulk_orders for ``grouping``."""
+        order_wires = [order_request_to_order_wire(order, await self.asset(order['coin'])) for order in order_requests]
+        order_action = order_wires_to_order_action(order_wires)
+        order_action['grouping'] = grouping
+        return await self.post_action(order_action)
+
+    async def order(self, coin, is_buy, sz, limit_px, order_type, reduce_only=False, cloid=None):
+        order = {
+            'coin': coin,
+            'is_buy': is_buy,
+            'sz': sz,
+            'limit_px': limit_px,
+            'order_type': order_type,
+            'reduce_only': reduce_only,
+        }
+        if cloid:
+            order['cloid'] = cloid
+        return await self.bulk_orders([order])
+
+    async def slippage_price(self, coin, is_buy, slippage, px=None):
+        if not px:
+            px = float((await self.all_mids())[coin])
+        px *= (1 + slippage) if is_buy else (1 - slippage)
+        # 5 significant figures and 6 decimals, as the SDK does
+        return round(float(f"{px:.5g}"), 6)
+
+    async def market_close(self, coin, sz=None, px=None, slippage=DEFAULT_SLIPPAGE, cloid=None):
+        address = self.vault_address or self.ADDRESS
+        positions = (await self.user_state(address))['assetPositions']
+        for position in positions:
+            item = position['position']
+            if coin != item['coin']:
+                continue
+            szi = float(item['szi'])
+            if not sz:
+                sz = abs(szi)
+            is_buy = szi < 0
+            px = await self.slippage_price(coin, is_buy, slippage, px)
+            return await self.order(coin, is_buy, sz, px, order_type={'limit': {'tif': 'Ioc'}}, reduce_only=True, cloid=cloid)
+
+    async def update_leverage(self, leverage, coin, is_cross=True):
+        action = {
+            'type': 'updateLeverage',
+            'asset': await self.asset(coin),
+            'isCross': is_cross,
+            'leverage': leverage,
+        }
+        result = await self.post_action(action)
+        logger.info(f'Updated leverage on Hyper for {coin}: {leverage}')
+        return result
+
+    ### same calls the bot makes on HyperLiquidClient ###
+    async def get_account(self):
+        return await self.user_state()
+
+    async def place_order(self, coin:str, size:float, is_buy:bool, limit_px:float):
+        logger.info(f"Creating hyper {'Buy' if is_buy else 'Sell'} order for {coin}")
+        try:
+            return await self.bulk_orders([limit_order_request(coin, size, is_buy, limit_px)])
+        except Exception as e:
+            logger.info(f"Error opening hyper position. Error: {e}")
+
+    async def place_orders(self, order_requests:list, grouping:str='na'):
+        logger.info(f"Creating {len(order_requests)} hyper orders for {sorted({order['coin'] for order in order_requests})}")
+        try:
+            result = await self.bulk_orders(order_requests, grouping=grouping)
+        except Exception as e:
+            logger.info(f"Error placing hyper orders. Error: {e}")
+            result = {'status': 'err', 'response': str(e)}
+        return order_statuses(result, order_requests)
+
+    async def place_entry_with_tpsl(self, coin:str, size:float, is_buy:bool, limit_px:float, low_price:float, high_price:float):
+        order_requests = [limit_order_request(coin, size, is_buy, limit_px)] + tpsl_order_requests(coin, size, is_buy, low_price, high_price)
+        entry_status, stop_status, take_status = await self.place_orders(order_requests, grouping='normalTpsl')
+        return entry_status, stop_status, take_status
+
+    async def place_tpsl(self, coin:str, size:float, is_buy:bool, low_price:float, high_price:float):
+        stop_status, take_status = await self.place_orders(tpsl_order_requests(coin, size, is_buy, low_price, high_price))
+        return stop_status, take_status
+
+    async def close_position(self, coin:str):
+        logger.info(f"Closing hyper position for {coin}")
+        try:
+            return await self.market_close(coin)
+        except Exception as e:
+            logger.info(f"Error closing hyper position. Error: {e}")
@@ -0,0 +1,50 @@
+# @version 0.3.10
+# 6 decimal token for the on-chain bench, anyone can mint. The same runtime code is
+# placed at the USDC and USDC.e addresses.
+
+event Transfer:
+    sender: indexed(address)
+    receiver: indexed(address)
+    value: uint256
+
+event Approval:
+    owner: indexed(address)
+    spender: indexed(address)
+    value: uint256
+
+decimals: public(constant(uint8)) = 6
+balanceOf: public(HashMap[address, uint256])
+allowance: public(HashMap[address, HashMap[address, uint256]])
+totalSupply: public(uint256)
+
+
+@external
+def transfer(recipient: address, amount: uint256) -> bool:
+    self.balanceOf[msg.sender] -= amount
+    self.balanceOf[recipient] += amount
+    log Transfer(msg.sender, recipient, amount)
+    return True
+
+
+@external
+def transferFrom(sender: address, recipient: address, amount: uint256) -> bool:
+    if self.allowance[sender][msg.sender] != max_value(uint256):
+        self.allowance[sender][msg.sender] -= amount
+    self.balanceOf[sender] -= amount
+    self.balanceOf[recipient] += amount
+    log Transfer(sender, recipient, amount)
+    return True
+
+
+@external
+def approve(spender: address, amount: uint256) -> bool:
+    self.allowance[msg.sender][spender] = amount
+    log Approval(msg.sender, spender, amount)
+    return True
+
+
+@external
+def mint(recipient: address, amount: uint256):
+    self.totalSupply += amount
+    self.balanceOf[recipient] += amount
+    log Transfer(empty(address), recipient, amount)
@@ -0,0 +1,14 @@
+# @version 0.3.10
+# Quotes 1:1 less the pool fee, the same rate MockSwapRouter02 pays out.
+
+struct QuoteExactInputSingleParams:
+    tokenIn: address
+    tokenOut: address
+    amountIn: uint256
+    fee: uint24
+    sqrtPriceLimitX96: uint160
+
+
+@external
+def quoteExactInputSingle(params: QuoteExactInputSingleParams) -> (uint256, uint160, uint32, uint256):
+    return params.amountIn * (1000000 - convert(params.fee, uint256)) / 1000000, 0, 0, 100000
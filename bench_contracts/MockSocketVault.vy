@@ -0,0 +1,20 @@
+# @version 0.3.10
+# The AEVO socket vault's deposit and fee quote, locking USDC.e like the real one.
+
+from vyper.interfaces import ERC20
+
+TOKEN: constant(address) = 0xFF970A61A04b1cA14834A43f5dE4533eBDDB5CC8
+FEE_PER_GAS: constant(uint256) = 100000000  # 0.1 gwei per unit of message gas
+
+
+@external
+@payable
+def depositToAppChain(receiver_: address, amount_: uint256, msgGasLimit_: uint256, connector_: address):
+    assert msg.value >= msgGasLimit_ * FEE_PER_GAS, "insufficient fees"
+    assert ERC20(TOKEN).transferFrom(msg.sender, self, amount_)
+
+
+@external
+@view
+def getMinFees(connector_: address, msgGasLimit_: uint256) -> uint256:
+    return msgGasLimit_ * FEE_PER_GAS
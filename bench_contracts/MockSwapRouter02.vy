@@ -0,0 +1,23 @@
+# @version 0.3.10
+# exactInputSingle at 1:1 less the pool fee, paid out of the router's own token balance.
+
+from vyper.interfaces import ERC20
+
+struct ExactInputSingleParams:
+    tokenIn: address
+    tokenOut: address
+    fee: uint24
+    recipient: address
+    amountIn: uint256
+    amountOutMinimum: uint256
+    sqrtPriceLimitX96: uint160
+
+
+@external
+@payable
+def exactInputSingle(params: ExactInputSingleParams) -> uint256:
+    amount_out: uint256 = params.amountIn * (1000000 - convert(params.fee, uint256)) / 1000000
+    assert amount_out >= params.amountOutMinimum, "Too little received"
+    assert ERC20(params.tokenIn).transferFrom(msg.sender, self, params.amountIn)
+    assert ERC20(params.tokenOut).transfer(params.recipient, amount_out)
+    return amount_out
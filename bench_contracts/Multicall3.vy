@@ -0,0 +1,36 @@
+# @version 0.3.10
+# The part of Multicall3 the readers use: aggregate3, getBlockNumber and getEthBalance.
+
+struct Call3:
+    target: address
+    allowFailure: bool
+    callData: Bytes[1024]
+
+struct Result:
+    success: bool
+    returnData: Bytes[1024]
+
+
+@external
+@payable
+def aggregate3(calls: DynArray[Call3, 64]) -> DynArray[Result, 64]:
+    results: DynArray[Result, 64] = []
+    for call in calls:
+        success: bool = False
+        response: Bytes[1024] = b""
+        success, response = raw_call(call.target, call.callData, max_outsize=1024, revert_on_failure=False)
+        assert success or call.allowFailure, "Multicall3: call failed"
+        results.append(Result({success: success, returnData: response}))
+    return results
+
+
+@external
+@view
+def getBlockNumber() -> uint256:
+    return block.number
+
+
+@external
+@view
+def getEthBalance(addr: address) -> uint256:
+    return addr.balance
@@ -0,0 +1,372 @@
+import argparse
+import asyncio
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from eth_account import Account
+from eth_utils import keccak
+from loguru import logger
+from web3 import AsyncWeb3, Web3
+from web3.eth import AsyncEth
+from web3.middleware import async_attrdict_middleware, attrdict_middleware
+from web3.providers.eth_tester.defaults import API_ENDPOINTS, static_return
+from web3.providers.eth_tester.main import AsyncEthereumTesterProvider, EthereumTesterProvider, _make_request
+from web3.providers.eth_tester.middleware import async_ethereum_tester_middleware, ethereum_tester_middleware
+
+try:
+    from eth_tester import EthereumTester, PyEVMBackend
+    from eth_tester.exceptions import TransactionFailed
+except ImportError:
+    raise SystemExit("The on-chain bench needs eth-tester with py-evm: pip install 'eth-tester[py-evm]'")
+
+from aevo_sdk.aevo_trading_tool.aevo_deposit import aevo_deposit
+from aevo_sdk.aevo_trading_tool.config import RPC
+from aevo_sdk.aevo_trading_tool.src.client.user import User
+from aevo_sdk.aevo_trading_tool.src.data import AEVO_CONTRACT
+from eth_account_client import EthAccountClient
+from fee_oracle import get_fee_oracle
+from hyper_liquid_client import HyperLiquidClient
+from multicall import MULTICALL3
+from rebalance import Rebalancer
+from swap_client import QUOTER_V2, SWAP_ROUTER_02
+from web3_pool import USDC, USDC_E, BatchingProvider, register
+
+BASELINE_FILE = 'onchain_baseline.json'
+CONTRACTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'bench_contracts')
+COMPILED_FILE = os.path.join(CONTRACTS_DIR, 'compiled.json')
+
+# the clients sign for arbitrum, so the test chain answers as arbitrum
+CHAIN_ID = 42161
+# the tool and the eth clients share one endpoint, like they do when rpc_end_point is the tool's RPC
+ENDPOINT = RPC
+# only used as a transfer recipient
+HYPER_BRIDGE = Web3.to_checksum_address('0x' + '22' * 20)
+
+WALLET = Account.from_key(keccak(text='onchain bench wallet'))
+OPERATOR = Account.from_key(keccak(text='onchain bench operator'))
+# eth-tester signs calls as an account it holds the key of, see tester_params
+CALLER = Account.from_key(keccak(text='onchain bench caller'))
+
+# runtime code placed at the addresses the clients use
+PLACEMENT = {
+    USDC: 'MockERC20',
+    USDC_E: 'MockERC20',
+    MULTICALL3: 'Multicall3',
+    SWAP_ROUTER_02: 'MockSwapRouter02',
+    QUOTER_V2: 'MockQuoterV2',
+    Web3.to_checksum_address(AEVO_CONTRACT): 'MockSocketVault',
+}
+
+
+def compile_contracts():
+    from vyper import compile_code
+    compiled = {}
+    for path in sorted(glob.glob(os.path.join(CONTRACTS_DIR, '*.vy'))):
+        with open(path, 'r') as file:
+            output = compile_code(file.read(), ['abi', 'bytecode_runtime'])
+        compiled[os.path.basename(path)[:-3]] = {'abi': output['abi'], 'runtime': output['bytecode_runtime']}
+    with open(COMPILED_FILE, 'w') as file:
+        json.dump(compiled, file, indent=2)
+    return compiled
+
+
+def load_contracts():
+    with open(COMPILED_FILE, 'r') as file:
+        return json.load(file)
+
+
+class RpcCounter:
+    """Counts requests per JSON-RPC method and round trips, a batch being one round trip.
+
+    Also serializes access to the tester, which isn't thread safe. ``latency`` is added to every
+    counted round trip, outside the lock.
+    """
+
+    def __init__(self, latency:float=0) -> None:
+        self.latency = latency
+        self.counts = Counter()
+        self.round_trips = 0
+        self.lock = threading.Lock()
+
+    def reset(self):
+        counts, round_trips = self.counts, self.round_trips
+        self.counts, self.round_trips = Counter(), 0
+        return counts, round_trips
+
+
+def tester_params(method, params):
+    # eth-tester needs a sender on calls and fails on legacy ones that carry a chain id, nodes take both
+    if method in ('eth_call', 'eth_estimateGas'):
+        # the tester middleware has already turned the keys into snake case
+        call = {key: value for key, value in params[0].items() if key != 'chain_id'}
+        call.setdefault('from', CALLER.address)
+        return [call, *params[1:]]
+    return params
+
+
+class BenchProvider(EthereumTesterProvider):
+    # without eth-tester's default field middleware, it fills 'from' with extra requests a node never sees
+    middlewares = (attrdict_middleware, ethereum_tester_middleware)
+
+    def __init__(self, tester, api_endpoints, counter, counted:bool=True) -> None:
+        super().__init__(tester, api_endpoints)
+        self.endpoint_uri = ENDPOINT
+        self.counter = counter
+        self.counted = counted
+
+    def make_request(self, method, params):
+        if self.counted:
+            self.counter.counts[method] += 1
+            self.counter.round_trips += 1
+            time.sleep(self.counter.latency)
+        with self.counter.lock:
+            return super().make_request(method, tester_params(method, params))
+
+
+class AsyncBenchProvider(BatchingProvider, AsyncEthereumTesterProvider):
+    # batches like the pooled HTTP provider, each batch is one round trip
+    middlewares = (async_attrdict_middleware, async_ethereum_tester_middleware)
+
+    def __init__(self, tester, api_endpoints, counter) -> None:
+        super().__init__()
+        self.ethereum_tester = tester
+        self.api_endpoints = api_endpoints
+        self.endpoint_uri = ENDPOINT
+        self.counter = counter
+
+    async def send_batch(self, requests):
+        self.counter.round_trips += 1
+        await asyncio.sleep(self.counter.latency)
+        return [self.respond(request) for request in requests]
+
+    def respond(self, request):
+        method, params = request['method'], request['params']
+        self.counter.counts[method] += 1
+        try:
+            with self.counter.lock:
+                response = _make_request(method, tester_params(method, params), self.api_endpoints, self.ethereum_tester)
+        except TransactionFailed as e:
+            # eth-tester raises reverts, a node answers with an error for that request only
+            response = {'error': {'code': 3, 'message': str(e)}}
+        return {**response, 'id': request['id']}
+
+
+class Bench:
+    """An in-process chain with mock USDC, USDC.e, Multicall3, Uniswap and AEVO vault contracts.
+
+    The mocks sit at their Arbitrum addresses and the pooled web3s for ``ENDPOINT`` are replaced by
+    ones on this chain, so the clients run unchanged. The operator account mints the payouts the
+    exchanges would send, through a web3 whose requests aren't counted.
+    """
+
+    def __init__(self, contracts, latency:float=0) -> None:
+        self.contracts = contracts
+        genesis_state = {
+            Web3.to_bytes(hexstr=address): {'balance': 0, 'nonce': 0, 'code': Web3.to_bytes(hexstr=contracts[name]['runtime']), 'storage': {}}
+            for address, name in PLACEMENT.items()
+        }
+        for account in (WALLET, OPERATOR, CALLER):
+            genesis_state[Web3.to_bytes(hexstr=account.address)] = {'balance': 100 * 10**18, 'nonce': 0, 'code': b'', 'storage': {}}
+        backend = PyEVMBackend(genesis_state=genesis_state)
+        backend.chain.chain_id = CHAIN_ID
+        self.tester = EthereumTester(backend)
+        self.tester.add_account(CALLER.key.hex())
+        api_endpoints = {**API_ENDPOINTS, 'eth': {**API_ENDPOINTS['eth'], 'chainId': static_return(CHAIN_ID)}}
+
+        self.counter = RpcCounter(latency)
+        self.web3 = Web3(BenchProvider(self.tester, api_endpoints, self.counter))
+        self.async_web3 = AsyncWeb3(AsyncBenchProvider(self.tester, api_endpoints, self.counter), modules={'eth': (AsyncEth,)}, middlewares=[])
+        self.admin = Web3(BenchProvider(self.tester, api_endpoints, self.counter, counted=False))
+        register(ENDPOINT, web3=self.web3, async_web3=self.async_web3)
+
+        os.environ.update({
+            'address': WALLET.address,
+            'private_key': WALLET.key.hex(),
+            'rpc_end_point': ENDPOINT,
+            'usdc_contract': USDC,
+            'usdce_contract': USDC_E,
+            'hyper_liquid_address': HYPER_BRIDGE,
+        })
+        # the sampler would otherwise wake up mid-scenario and add to its counts
+        get_fee_oracle(ENDPOINT).interval = 3600
+        # the router pays swaps out of its own balance
+        for token in (USDC, USDC_E):
+            self.mint(token, SWAP_ROUTER_02, 10**15)
+
+    def mint(self, token:str, to:str, amount:int):
+        contract = self.admin.eth.contract(address=token, abi=self.contracts['MockERC20']['abi'])
+        tx = contract.functions.mint(to, amount).build_transaction({
+            'from': OPERATOR.address,
+            'nonce': self.admin.eth.get_transaction_count(OPERATOR.address),
+            'gas': 100000,
+            'maxFeePerGas': 10**10,
+            'maxPriorityFeePerGas': 0,
+        })
+        tx_hash = self.admin.eth.send_raw_transaction(OPERATOR.sign_transaction(tx).rawTransaction)
+        return self.admin.eth.wait_for_transaction_receipt(tx_hash)['blockNumber']
+
+
+class BenchHyperClient(HyperLiquidClient):
+    """HyperLiquidClient's on-chain half, withdraws are paid out by the bench instead of the exchange."""
+
+    def __init__(self, bench) -> None:
+        self.bench = bench
+        self.ADDRESS = WALLET.address
+        self.SECRET_KEY = WALLET.key.hex()
+        self.NODE_URL = ENDPOINT
+        self.USDC_CONTRACT_ADDRESS = USDC
+        self.USDCE_CONTRACT_ADDRESS = USDC_E
+        self.HYPER_ADDRESS = HYPER_BRIDGE
+
+    def withdraw(self, amount:float):
+        # hyperliquid keeps $1 and pays out native usdc
+        self.bench.mint(USDC, self.ADDRESS, int((amount - 1) * 10**6))
+
+
+class BenchAevoClient:
+    """Stands in for AevoClient, deposits go through the trading tool and withdraws are paid out by the bench."""
+
+    def __init__(self, bench) -> None:
+        self.bench = bench
+
+    async def deposit(self, amount:float):
+        return await aevo_deposit(amount=amount)
+
+    async def withdraw(self, amount:float):
+        await asyncio.to_thread(self.bench.mint, USDC_E, WALLET.address, int(amount * 10**6))
+
+
+def build_cases(bench, state_dir):
+    """End to end runs of the on-chain paths, each funds the wallet with what it spends."""
+    eth_client = EthAccountClient()
+    hyper_client = BenchHyperClient(bench)
+    aevo_client = BenchAevoClient(bench)
+
+    async def get_usdc_balance_x10():
+        for i in range(10):
+            await asyncio.to_thread(eth_client.get_usdc_balance, is_usdc=i % 2 == 0)
+
+    async def swap_usdc():
+        await asyncio.to_thread(bench.mint, USDC, WALLET.address, 100 * 10**6)
+        await asyncio.to_thread(eth_client.swap_usdc, to_usdc=False, amount=100)
+
+    async def hyper_deposit_x3():
+        await asyncio.to_thread(bench.mint, USDC, WALLET.address, 30 * 10**6)
+        for _ in range(3):
+            await asyncio.to_thread(hyper_client.deposit, amount=10)
+
+    async def tool_deposit():
+        await asyncio.to_thread(bench.mint, USDC_E, WALLET.address, 50 * 10**6)
+        await aevo_deposit(amount=50)
+
+    async def tool_wait_for_withdraw():
+        user = User(WALLET.key.hex())
+        balance_before_withdraw = await user.get_wallet_balance('USDC')
+        start_block = await user.web3.eth.block_number
+        payout = asyncio.create_task(asyncio.to_thread(bench.mint, USDC_E, WALLET.address, 25 * 10**6))
+        await user.wait_for_withdraw(balance_before_withdraw, 'USDC', since_block=start_block)
+        await payout
+
+    def rebalance(hyper_balance, aevo_balance):
+        async def run():
+            state_file = tempfile.mktemp(suffix='.json', dir=state_dir)
+            rebalancer = Rebalancer(hyper_client, aevo_client, state_file=state_file, eth_account_client=eth_client)
+            state = await rebalancer.run({'withdrawable': hyper_balance}, {'balance': aevo_balance})
+            assert state['step'] == 'done', state
+        return run
+
+    return {
+        'eth_account.get_usdc_balance_x10': get_usdc_balance_x10,
+        'eth_account.swap_usdc': swap_usdc,
+        'hyper.deposit_x3': hyper_deposit_x3,
+        'tool.deposit': tool_deposit,
+        'tool.wait_for_withdraw': tool_wait_for_withdraw,
+        'rebalance.hyper_to_aevo': rebalance(1000, 600),
+        'rebalance.aevo_to_hyper': rebalance(600, 1000),
+    }
+
+
+async def measure(bench, fn):
+    bench.counter.reset()
+    start = time.perf_counter()
+    # the clients print transaction hashes, keep them out of the table
+    with contextlib.redirect_stdout(io.StringIO()):
+        await fn()
+    wall_ms = (time.perf_counter() - start) * 1e3
+    counts, round_trips = bench.counter.reset()
+    return {'wall_ms': wall_ms, 'rpc_calls': sum(counts.values()), 'round_trips': round_trips, 'methods': dict(counts.most_common())}
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'case':36} {'baseline rpcs':>14} {'rpcs':>6} {'baseline ms':>12} {'ms':>9}")
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            print(f"{name:36} {'-':>14} {result['rpc_calls']:>6} {'-':>12} {result['wall_ms']:>9.1f}")
+            continue
+        print(f"{name:36} {before['rpc_calls']:>14} {result['rpc_calls']:>6} {before['wall_ms']:>12.1f} {result['wall_ms']:>9.1f}")
+        # counts are deterministic, wall time only counts when it moves past the threshold
+        if result['rpc_calls'] > before['rpc_calls'] or result['wall_ms'] > before['wall_ms'] * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+async def run_cases(args):
+    contracts = compile_contracts() if args.compile else load_contracts()
+    bench = Bench(contracts, latency=args.latency / 1e3)
+    results = {}
+    with tempfile.TemporaryDirectory() as state_dir:
+        print(f"{'case':36} {'ms':>9} {'rpcs':>6} {'trips':>6}  methods")
+        for name, fn in build_cases(bench, state_dir).items():
+            if args.filter not in name:
+                continue
+            # the first run fills the caches, the second is the steady state
+            for run in ('cold', 'warm'):
+                result = await measure(bench, fn)
+                results[f'{name}.{run}'] = result
+                methods = ' '.join(f'{method}={count}' for method, count in result['methods'].items())
+                print(f"{name + '.' + run:36} {result['wall_ms']:>9.1f} {result['rpc_calls']:>6} {result['round_trips']:>6}  {methods}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the on-chain paths against an in-process chain and count their RPC calls.')
+    parser.add_argument('-k', '--filter', default='', help='only run cases containing this string, the caches carry over between cases so compare runs with the same filter')
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds added to every RPC call')
+    parser.add_argument('--compile', action='store_true', help='recompile the mock contracts with vyper first')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='slowdown that counts as a regression')
+    args = parser.parse_args()
+
+    # the clients log every step, keep that out of the table
+    logger.remove()
+
+    results = asyncio.run(run_cases(args))
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline, 'r') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+
+    if args.save:
+        with open(args.baseline, 'w') as file:
+            json.dump({'python': platform.python_version(), 'latency_ms': args.latency, 'saved_at': int(time.time()), 'results': results}, file, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+
+    if regressions:
+        print(f"\nMore RPC calls or slower than baseline: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
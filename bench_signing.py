@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import platform
+import random
+import time
+
+from eth_account import Account
+from loguru import logger
+from web3 import AsyncWeb3
+
+from aevo_sdk.aevo import AevoLibClient, Order, make_domain
+from aevo_sdk.aevo_trading_tool.src.bot.utils import data_exctractor
+
+BASELINE_FILE = 'signing_baseline.json'
+
+# Arbitrum USDC.e and a dummy socket connector, only used as signed field values
+COLLATERAL = '0xff970a61a04b1ca14834a43f5de4533ebddb5cc8'
+CONNECTOR = '0x' + '11' * 20
+
+
+def measure(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - start)
+    samples.sort()
+    total = sum(samples)
+    return {
+        'iterations': iterations,
+        'ops_per_sec': iterations / (total / 1e9),
+        'p50_us': samples[len(samples) // 2] / 1e3,
+        'p99_us': samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1e3,
+    }
+
+
+def batch_size(name):
+    # batch cases do 100 signatures (or hashes) per call
+    return 100 if name.endswith('_100') else 1
+
+
+def build_cases():
+    """Every signing path an order, withdraw or account set up goes through, with realistic arguments."""
+    wallet = Account.create()
+    signing = Account.create()
+    client = AevoLibClient(
+        signing_key=signing.key.hex(),
+        wallet_address=wallet.address,
+        wallet_private_key=wallet.key.hex(),
+        env='mainnet',
+    )
+    web3 = AsyncWeb3()
+    domain = make_domain(**client.signing_domain)
+
+    def order_args():
+        return {
+            'instrument_id': random.randint(1, 500),
+            'is_buy': random.random() < 0.5,
+            'limit_price': round(random.uniform(0.01, 70000), 2),
+            'quantity': round(random.uniform(0.1, 100), 1),
+        }
+
+    def order_struct():
+        args = order_args()
+        return Order(
+            maker=wallet.address,
+            isBuy=args['is_buy'],
+            limitPrice=int(args['limit_price'] * 10**6),
+            amount=int(args['quantity'] * 10**6),
+            salt=random.randint(0, 10**10),
+            instrument=args['instrument_id'],
+            timestamp=int(time.time()),
+        )
+
+    orders = [order_args() for _ in range(100)]
+    return {
+        'aevo.sign_order': lambda: client.sign_order(timestamp=int(time.time()), **order_args()),
+        'aevo.create_order_rest_json': lambda: client.create_order_rest_json(**order_args()),
+        'aevo.create_order_ws_json': lambda: client.create_order_ws_json(**order_args()),
+        'aevo.sign_withdraw': lambda: client.sign_withdraw(
+            collateral=COLLATERAL, to=wallet.address, amount=random.uniform(10, 10000), data=None, amount_decimals=10**6
+        ),
+        'aevo.sign_orders_batch_100': lambda: client.sign_orders_batch(orders, min_pool_batch=len(orders) + 1),
+        # the warmup calls start the pool's workers, so this measures the steady state
+        'aevo.sign_orders_batch_pool_100': lambda: client.sign_orders_batch(orders),
+        'eip712.signable_bytes': lambda: order_struct().signable_bytes(domain),
+        'eip712.hash_structs_100': lambda: Order.hash_structs([tuple(order_struct()._values) for _ in range(100)]),
+        'tool.get_signatures': lambda: data_exctractor.get_signatures(web3, wallet.address, wallet),
+        'tool.sign_withdraw': lambda: data_exctractor.sign_withdraw(
+            web3, COLLATERAL, wallet.address, random.randint(10**6, 10**10), random.randint(0, 10**10),
+            wallet.key.hex(), 10**15, 2 * 10**5, CONNECTOR,
+        ),
+        'tool.sign_staking': lambda: data_exctractor.sign_staking(
+            web3, wallet.key.hex(), COLLATERAL, wallet.address, random.randint(10**6, 10**10), random.randint(0, 10**10)
+        ),
+        'tool.sign_staking_withdraw': lambda: data_exctractor.sign_staking_withdraw(
+            web3, wallet.key.hex(), COLLATERAL, wallet.address, random.randint(10**6, 10**10), random.randint(0, 10**10)
+        ),
+        'tool.sign_order': lambda: data_exctractor.sign_order(
+            wallet.address, signing.key.hex(), True, 10**6, 2000 * 10**6, random.randint(0, 10**10), time.time(), 1
+        ),
+    }
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'case':32} {'baseline ops/s':>15} {'ops/s':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            print(f"{name:32} {'-':>15} {result['ops_per_sec']:>12.1f} {'new':>8}")
+            continue
+        change = result['ops_per_sec'] / before['ops_per_sec'] - 1
+        print(f"{name:32} {before['ops_per_sec']:>15.1f} {result['ops_per_sec']:>12.1f} {change:>+8.1%}")
+        if change < -threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Aevo signing paths.')
+    parser.add_argument('-n', '--iterations', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('-k', '--filter', default='', help='only run cases containing this string')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown that counts as a regression')
+    args = parser.parse_args()
+
+    # sign_order logs the signing domain on every call, keep that out of the numbers' output
+    logger.remove()
+    random.seed(0)
+
+    results = {}
+    print(f"{'case':32} {'ops/s':>12} {'per item/s':>12} {'p50 us':>10} {'p99 us':>10}")
+    for name, fn in build_cases().items():
+        if args.filter not in name:
+            continue
+        size = batch_size(name)
+        iterations = max(args.iterations // size, 5)
+        result = measure(fn, iterations, min(args.warmup, iterations))
+        # per item throughput puts the batch cases on the same scale as aevo.sign_order
+        result['items_per_sec'] = result['ops_per_sec'] * size
+        results[name] = result
+        print(f"{name:32} {result['ops_per_sec']:>12.1f} {result['items_per_sec']:>12.1f} {result['p50_us']:>10.1f} {result['p99_us']:>10.1f}")
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline, 'r') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+
+    if args.save:
+        with open(args.baseline, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'saved_at': int(time.time()), 'results': results}, file, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+
+    if regressions:
+        print(f"\nSlower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
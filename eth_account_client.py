@@ -1,4 +1,3 @@
-from uniswap import Uniswap
 from web3 import Web3
 import math
 # Constants
@@ -6,13 +5,18 @@ import json
 import os
 from dotenv import load_dotenv
 
+from arrival_watcher import ArrivalWatcher
+from multicall import get_reader
+from swap_client import get_swap_client
+from web3_pool import get_async_web3, get_web3
+
 
 class EthAccountClient:
     def __init__(self) -> None:
         load_dotenv()
         self.ADDRESS = os.getenv('address') 
         self.PRIVATE_KEY = os.getenv('private_key')
-        self.UNISWAP_VERSION = 3
+        self.SWAP_FEE = 500
         self.NODE_URL = os.getenv('rpc_end_point')
         self.USDC_CONTRACT_ADDRESS = Web3.to_checksum_address(os.getenv('usdc_contract'))
         self.USDCE_CONTRACT_ADDRESS = Web3.to_checksum_address(os.getenv('usdce_contract'))
@@ -22,26 +26,27 @@ class EthAccountClient:
         with open(filepath, 'r') as file:
             return json.load(file)
         
-    def swap_usdc(self,to_usdc:bool,amount:float):
+    def swap_client(self):
+        return get_swap_client(get_web3(self.NODE_URL), self.ADDRESS, self.PRIVATE_KEY, self.USDC_CONTRACT_ADDRESS, self.USDCE_CONTRACT_ADDRESS, fee=self.SWAP_FEE)
+
+    def swap_usdc(self,to_usdc:bool,amount:float,slippage:float=0.001):
         swap_amount = math.floor((amount * (10**6)))
-        uniswap = Uniswap(address=self.ADDRESS, private_key=self.PRIVATE_KEY, version=self.UNISWAP_VERSION, provider=self.NODE_URL)
         token_in = self.USDCE_CONTRACT_ADDRESS if to_usdc else self.USDC_CONTRACT_ADDRESS
-        token_out = self.USDC_CONTRACT_ADDRESS if to_usdc else self.USDCE_CONTRACT_ADDRESS 
-        uniswap.make_trade(token_in, token_out, swap_amount,fee=500)  # sell 1 usdc for usdce 
+        return self.swap_client().swap(token_in, swap_amount, slippage=slippage)  # sell usdc.e for usdc or back
 
-
-    def get_usdc_balance(self,is_usdc:bool):
+    def get_usdc_balance(self,is_usdc:bool,min_block:int=0):
         contract_address = self.USDC_CONTRACT_ADDRESS if is_usdc else self.USDCE_CONTRACT_ADDRESS 
-        # Ensure that the connection is established
-        web3 = Web3(Web3.HTTPProvider(self.NODE_URL))
-        if web3.is_connected():
-            print("Successfully connected to the Ethereum node.")
-            web3 = Web3(Web3.HTTPProvider(self.NODE_URL))
-            usdc_contract = web3.eth.contract(address=contract_address, abi=self.ERC20_ABI)
-            balance = usdc_contract.functions.balanceOf(Web3.to_checksum_address(self.ADDRESS)).call()
-            return balance / 10**6  # Assuming USDC has 6 decimals
-        else:
-            print('error connecting')
+        web3 = get_web3(self.NODE_URL)
+        try:
+            # both balances come back in one multicall, the other one is cached for the next call
+            state = get_reader(web3).read(self.ADDRESS, tokens=(self.USDC_CONTRACT_ADDRESS, self.USDCE_CONTRACT_ADDRESS), min_block=min_block)
+            return state.balances[contract_address] / 10**6  # Assuming USDC has 6 decimals
+        except Exception as e:
+            print(f'error connecting {e}')
+
+    def arrival_watcher(self):
+        # usdc and usdc.e transfers into the wallet, see ArrivalWatcher
+        return ArrivalWatcher(get_async_web3(self.NODE_URL), owner=self.ADDRESS, tokens=(self.USDC_CONTRACT_ADDRESS, self.USDCE_CONTRACT_ADDRESS))
 
 if __name__ == '__main__':
     eth_client = EthAccountClient()
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+
+from loguru import logger
+
+from web3_pool import get_web3
+
+GAS_LIMIT_MARGIN = 1.3  # arbitrum estimates include the l1 calldata cost, which moves with l1 gas
+# a first write to a storage slot costs about 17k more than an overwrite, e.g. approve from a zero
+# allowance, so a limit learned on an overwrite still has room for one
+STORAGE_HEADROOM = 20000
+GAS_LIMIT_TTL = 300  # seconds, after that the l1 part may have moved and the method is estimated again
+
+
+def tx_key(tx):
+    # gas used depends on the contract and method, not the arguments, closely enough for a limit
+    data = tx.get('data') or tx.get('input') or '0x'
+    if isinstance(data, bytes):
+        data = '0x' + data.hex()
+    return (str(tx.get('to', '')).lower(), data[:10])
+
+
+def estimate_params(tx):
+    # a placeholder gas of 0 would make the estimate fail
+    return {key: value for key, value in tx.items() if key != 'gas'}
+
+
+class FeeOracle:
+    """Recent base and priority fees from ``eth_feeHistory``, sampled in a background thread.
+
+    Transactions take their fees from the last sample and their gas limit from the limits
+    learned per contract method, so building one costs no fee or estimate round trips once
+    a method has been seen. Learned limits expire after ``gas_limit_ttl`` and are dropped when a
+    transaction sent with one runs out of gas.
+    """
+
+    def __init__(self, web3, interval:float=15, blocks:int=20, percentile:int=50, max_age:float=60, gas_limit_ttl:float=GAS_LIMIT_TTL) -> None:
+        self.web3 = web3
+        self.interval = interval
+        self.blocks = blocks
+        self.percentile = percentile
+        self.max_age = max_age
+        self.gas_limit_ttl = gas_limit_ttl
+        self.base_fee = None
+        self.priority_fee = None
+        self.sampled_at = 0
+        self.gas_limits = {}  # tx_key -> (gas limit, learned at)
+        self.watches = set()  # receipt waits of unconfirmed sends, see watch_async
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def sample(self):
+        history = self.web3.eth.fee_history(self.blocks, 'latest', [self.percentile])
+        if history.get('baseFeePerGas'):
+            # the last base fee is the one for the next block
+            base_fee = history['baseFeePerGas'][-1]
+        else:
+            # some nodes return an empty history
+            base_fee = self.web3.eth.get_block('latest')['baseFeePerGas']
+        rewards = sorted(reward[0] for reward in history.get('reward') or [] if reward)
+        priority_fee = rewards[len(rewards) // 2] if rewards else 0
+        with self.lock:
+            self.base_fee, self.priority_fee, self.sampled_at = base_fee, priority_fee, time.time()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception as e:
+                logger.info(f"Error sampling fees {e}")
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def fresh(self):
+        if time.time() - self.sampled_at > self.max_age:
+            # first use, or the sampler is failing
+            self.sample()
+        self.start()
+
+    def fees(self):
+        """EIP-1559 fee fields, the max fee leaves room for the base fee to double."""
+        self.fresh()
+        return {
+            'maxFeePerGas': 2 * self.base_fee + self.priority_fee,
+            'maxPriorityFeePerGas': self.priority_fee,
+        }
+
+    def gas_price(self):
+        """A legacy gasPrice that pays the next block's base fee and the usual tip."""
+        self.fresh()
+        return self.base_fee + self.priority_fee
+
+    def learn(self, tx, gas:int):
+        """Stores a limit for the method of ``tx`` from an estimate or the gas a receipt used."""
+        limit = int(gas * GAS_LIMIT_MARGIN) + STORAGE_HEADROOM
+        key = tx_key(tx)
+        with self.lock:
+            previous = self.cached_gas_limit(tx)
+            self.gas_limits[key] = (max(limit, previous or 0), time.time())
+            return self.gas_limits[key][0]
+
+    def forget(self, tx):
+        with self.lock:
+            self.gas_limits.pop(tx_key(tx), None)
+
+    def observe(self, receipt, tx):
+        """Checks a mined transaction's gas against the limit it was sent with."""
+        if receipt['status'] != 1 and receipt['gasUsed'] >= tx.get('gas', 0):
+            # ran out of gas, the next one is estimated again
+            logger.info(f"Transaction {receipt['transactionHash'].hex()} ran out of gas at {receipt['gasUsed']}")
+            self.forget(tx)
+        elif receipt['status'] == 1:
+            self.learn(tx, receipt['gasUsed'])
+
+    async def watch_async(self, web3, tx_hash, tx):
+        try:
+            self.observe(await web3.eth.wait_for_transaction_receipt(tx_hash), tx)
+        except Exception as e:
+            logger.info(f"Error waiting for receipt {e}")
+
+    def watch(self, web3, tx_hash, tx):
+        """Observes a transaction sent without waiting for it, once it is mined."""
+        task = asyncio.get_running_loop().create_task(self.watch_async(web3, tx_hash, tx))
+        # the loop only keeps weak references to tasks
+        self.watches.add(task)
+        task.add_done_callback(self.watches.discard)
+
+    def cached_gas_limit(self, tx):
+        entry = self.gas_limits.get(tx_key(tx))
+        if entry is None or time.time() - entry[1] > self.gas_limit_ttl:
+            return None
+        return entry[0]
+
+    def gas_limit(self, tx):
+        limit = self.cached_gas_limit(tx)
+        if limit is None:
+            limit = self.learn(tx, self.web3.eth.estimate_gas(estimate_params(tx)))
+        return limit
+
+    async def gas_limit_async(self, web3, tx):
+        """Same as gas_limit, estimating on the caller's AsyncWeb3 when the method is new."""
+        limit = self.cached_gas_limit(tx)
+        if limit is None:
+            limit = self.learn(tx, await web3.eth.estimate_gas(estimate_params(tx)))
+        return limit
+
+_lock = threading.Lock()
+_oracles = {}
+
+
+def get_fee_oracle(endpoint:str) -> FeeOracle:
+    """One oracle per RPC endpoint, sharing its samples and gas limits across clients."""
+    with _lock:
+        oracle = _oracles.get(endpoint)
+        if oracle is None:
+            oracle = _oracles[endpoint] = FeeOracle(get_web3(endpoint))
+        return oracle
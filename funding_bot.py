@@ -3,30 +3,47 @@ import asyncio
 from decimal import *
 from aevo_sdk.aevo_client import AevoClient
 from hyper_liquid_client import HyperLiquidClient
+from async_hyper_liquid_client import AsyncHyperLiquidClient
 import pandas as pd
 from loguru import logger
 from datetime import datetime
 ### rebalance ###
-from rebalance import rebalance
+from rebalance import Rebalancer
 ### utils ###
 from trading_utils import get_quantity,calculate_proximity_to_liquidation,round_price,limit_price_setter,round_aevo_price
+from instrument_cache import InstrumentCache
+from order_book import OrderBooks
 
 ### websockets ###
-from hyper_websocket import HyperLiquidWebSocket
+from hyper_websocket import HyperLiquidWebSocket, HyperFill
 from aevo_sdk.aevo_websocket import AevoWebSocket
+from aevo_sdk.aevo_presigner import AevoPreSigner
+from aevo_sdk.aevo_order_tracker import TERMINAL_STATES
 
 #### telegram ####
 from telegram_manager import TelegramManager
 
+HYPER_OPEN_STATUSES = ('open', 'triggered')
+AEVO_ENTRY_TIMEOUT = 5  # seconds for a marketable aevo entry to start filling
+MAX_DONE_HYPER_ORDERS = 100  # finished orders kept for late fills and average prices
+
 
 class TradingBot:
     def __init__(self):
+        self.instruments = InstrumentCache()
         self.hyper_client = HyperLiquidClient() 
-        self.aevo_client = AevoClient()
+        self.hyper_async = AsyncHyperLiquidClient(instruments=self.instruments)
+        self.aevo_client = AevoClient(instruments=self.instruments)
         self.telegram_manager = TelegramManager()
         self.coins = ['BTC','ETH','DOGE']
-        self.hyper_ws = HyperLiquidWebSocket(message_callback=self.process_hyper_message)
+        self.hyper_ws = HyperLiquidWebSocket(message_callback=self.process_hyper_message,order_callback=self.process_hyper_order_event)
         self.aevo_ws = AevoWebSocket(message_callback=self.process_aevo_message,coins=self.coins)
+        self.aevo_presigner = AevoPreSigner(self.aevo_client.aevo_client)
+        # one instance, so a resumed rebalance and a new one can't run side by side
+        self.rebalancer = Rebalancer(hyper_client=self.hyper_client,aevo_client=self.aevo_client,alert=self.telegram_manager.send_message)
+        self.hyper_books = OrderBooks()
+        self.aevo_books = OrderBooks(instruments=self.instruments)
+        self.book_max_age = 5  # seconds before a book is too old to price from
         self.ws_started = False
         self.leverage = 10
         self.threshold = 0.01
@@ -38,6 +55,7 @@ class TradingBot:
         self.aevo_account = None
         self.aevo_position = None
         self.fundings = {}
+        self.hyper_orders = {}  # oid -> status, filled size and notional from the order and fill streams
         self.df = pd.DataFrame(columns=['coin', 'hyper_funding_rate', 'aevo_funding_rate', 'funding_rate_spread', 'hyper_price', 'aevo_price', 'pnl', 'hours_needed','instrument_id','buyer','open_position','hyper_side','aevo_side','hyper_liquidation_px','aevo_liquidation_px'])
         self.lock = asyncio.Lock()  # Initialize the lock
         self.hyper_value = 0.0
@@ -45,24 +63,26 @@ class TradingBot:
         self.value_df = pd.DataFrame(columns=['timestamp','aevo_value','hyper_value','total_value'])
         self.value_log_file = 'account_values.csv'
         self.load_value_df()
-        self.update_leverage()
 
     async def start(self):
+        await self.update_leverage()
         await self.get_accounts()
         await asyncio.gather(
             self.hyper_ws.start(coins=self.coins),
-            self.aevo_ws.start(coins=self.coins)
+            self.aevo_ws.start(coins=self.coins),
+            self.aevo_presigner.run(),
+            self.resume_rebalance(),
         )
 
-    def update_leverage(self):
-        for coin in self.coins:
-            self.hyper_client.update_leverage(leverage=self.leverage,coin=coin)
-            self.aevo_client.update_leverage(leverage=self.leverage,coin=coin)
+    async def update_leverage(self):
+        await asyncio.gather(
+            *[self.hyper_async.update_leverage(leverage=self.leverage,coin=coin) for coin in self.coins],
+            *[asyncio.to_thread(self.aevo_client.update_leverage,leverage=self.leverage,coin=coin) for coin in self.coins],
+        )
         
     async def get_accounts(self):
         # Load positions from both platforms
-        self.hyper_account = self.hyper_client.get_account()
-        self.aevo_account = await self.aevo_client.get_account()
+        self.hyper_account, self.aevo_account = await asyncio.gather(self.hyper_async.get_account(), self.aevo_client.get_account())
 
         self.hyper_value = float(self.hyper_account['marginSummary']['accountValue'])
         self.aevo_value = float(self.aevo_account['equity'])
@@ -91,7 +111,9 @@ class TradingBot:
 
     async def process_hyper_message(self,msg):
         data = msg.get('data',{})
-        if msg.get('channel') == 'activeAssetCtx':
+        if msg.get('channel') == 'l2Book':
+            self.hyper_books.apply_hyper_l2(data)
+        elif msg.get('channel') == 'activeAssetCtx':
             ctx = data.get('ctx')
             if not ctx: return
             coin = data['coin']
@@ -118,6 +140,33 @@ class TradingBot:
 
 
 
+    async def process_hyper_order_event(self,event):
+        if isinstance(event, HyperFill) and event.snapshot and event.oid not in self.hyper_orders:
+            # history from before start, or an order already pruned
+            return
+        order = self.hyper_orders.setdefault(event.oid, {'coin': event.coin, 'status': 'open', 'filled': 0.0, 'notional': 0.0, 'tids': set()})
+        if isinstance(event, HyperFill):
+            if event.tid in order['tids']: return
+            order['tids'].add(event.tid)
+            order['filled'] += event.sz
+            order['notional'] += event.sz * event.px
+            logger.info(f"Hyper fill {event.coin} {event.sz} @ {event.px}, avg {self.hyper_avg_price(event.oid)}")
+        else:
+            order['status'] = event.status
+            logger.info(f"Hyper order {event.oid} {event.coin} {event.status}")
+            if event.status not in HYPER_OPEN_STATUSES:
+                self.prune_hyper_orders()
+
+    def prune_hyper_orders(self):
+        done = [oid for oid, order in self.hyper_orders.items() if order['status'] not in HYPER_OPEN_STATUSES]
+        for oid in done[:-MAX_DONE_HYPER_ORDERS]:
+            del self.hyper_orders[oid]
+
+    def hyper_avg_price(self,oid):
+        order = self.hyper_orders.get(oid)
+        if not order or not order['filled']: return None
+        return order['notional'] / order['filled']
+
     async def process_aevo_message(self,msg):
         data = msg.get('data',{})
         # for api funding rate hits
@@ -126,6 +175,11 @@ class TradingBot:
                 self.fundings[funding_coin] = self.fundings.get(funding_coin, {})
                 self.fundings[funding_coin]['aevo_funding_rate'] = funding_rate
                 await self.funding_bot_main(funding_coin)
+        elif str(msg.get('channel')).startswith('orderbook'):
+            if self.aevo_books.apply_aevo_orderbook(data) is None:
+                # a missed update, resubscribing sends a fresh snapshot
+                logger.warning(f"Aevo book {data.get('instrument_name')} out of sync, resubscribing")
+                await self.aevo_ws.resubscribe_orderbook(data['instrument_name'])
         elif msg.get('channel') == 'positions':
             try:
                 position = data['positions'][0]
@@ -178,6 +232,23 @@ class TradingBot:
         total_pnl = percent_pnl - self.hyper_client.TAKER_FEE - self.aevo_client.TAKER_FEE
         return total_pnl
 
+    def book_price(self,books,coin,is_buy,size,limit=False):
+        book = books.fresh(coin,self.book_max_age)
+        if book is None or not size:
+            return None
+        return book.limit_price(is_buy,size) if limit else book.vwap(is_buy,size)
+
+    def fill_prices(self,coin,buyer,hyper_mark_price,aevo_mark_price,limit=False):
+        # what an entry of our size would really pay on each book, the mark when a book can't tell
+        aevo_is_buy = buyer == 'AEVO'
+        try:
+            size = self.get_entry_size({'coin':coin,'hyper_price':hyper_mark_price,'aevo_price':aevo_mark_price})
+        except Exception:
+            size = None
+        hyper_price = self.book_price(self.hyper_books,coin,not aevo_is_buy,size,limit)
+        aevo_price = self.book_price(self.aevo_books,coin,aevo_is_buy,size,limit)
+        return hyper_price or hyper_mark_price, aevo_price or aevo_mark_price
+
     async def funding_bot_main(self, coin):
         pos = self.fundings.get(coin, {})
         if 'hyper_mark_price' in pos and 'hyper_funding_rate' in pos and 'aevo_mark_price' in pos and 'aevo_funding_rate' in pos:
@@ -190,10 +261,12 @@ class TradingBot:
 
             if hyper_funding_rate >= aevo_funding_rate:
                 spread = hyper_funding_rate - aevo_funding_rate
-                total_pnl = self.get_profitablity(hyper_mark_price=hyper_mark_price,aevo_mark_price=aevo_mark_price,buyer='AEVO')
+                hyper_fill_price, aevo_fill_price = self.fill_prices(coin,'AEVO',hyper_mark_price,aevo_mark_price)
+                total_pnl = self.get_profitablity(hyper_mark_price=hyper_fill_price,aevo_mark_price=aevo_fill_price,buyer='AEVO')
             elif hyper_funding_rate < aevo_funding_rate:
                 spread = aevo_funding_rate - hyper_funding_rate
-                total_pnl = self.get_profitablity(hyper_mark_price=hyper_mark_price,aevo_mark_price=aevo_mark_price,buyer='HYPER_LIQUID')
+                hyper_fill_price, aevo_fill_price = self.fill_prices(coin,'HYPER_LIQUID',hyper_mark_price,aevo_mark_price)
+                total_pnl = self.get_profitablity(hyper_mark_price=hyper_fill_price,aevo_mark_price=aevo_fill_price,buyer='HYPER_LIQUID')
 
             hours_needed = (total_pnl * -1) / spread
 
@@ -239,6 +312,7 @@ class TradingBot:
                 # Find the row with the maximum PNL
                 if not self.has_position:
                     max_pnl_row = self.df.loc[self.df['hours_needed'].idxmin()]
+                    self.prepare_entry(row=max_pnl_row)
                     if max_pnl_row['pnl'] > 0:
                         logger.info("\nRow with the best hours:")
                         logger.info(max_pnl_row)
@@ -298,7 +372,8 @@ class TradingBot:
         instrument_id = self.aevo_position['instrument_id']
         aevo_opposite_side = False if self.aevo_position['side'] == 'buy' else True
         quantity = float(self.aevo_position['amount'])
-        hyper_close_result = self.hyper_client.close_position(coin=self.hyper_position['coin'])
+        await self.cancel_aevo_orders(instrument_id)
+        hyper_close_result = await self.hyper_async.close_position(coin=self.hyper_position['coin'])
         aevo_close_result = self.aevo_client.place_order(instrument_id=instrument_id,is_buy=aevo_opposite_side,reduce_only=True,quantity=quantity)
         
         logger.info(f'Hyper Close Result: {hyper_close_result}')
@@ -311,11 +386,16 @@ class TradingBot:
         # await self.rebalance()
         # await self.start()
 
+    async def resume_rebalance(self):
+        # finish a rebalance a crash interrupted, alongside the feeds
+        if self.rebalancer.pending:
+            await self.rebalancer.run()
+
     async def rebalance(self):    
         #### re balance #####
         # check and update balances again # 
         await self.get_accounts()
-        await rebalance(hyper_client=self.hyper_client,aevo_client=self.aevo_client,hyper_account=self.hyper_account,aevo_account=self.aevo_account)
+        await self.rebalancer.run(hyper_account=self.hyper_account,aevo_account=self.aevo_account)
 
         # self.funding_rates()
         # self.open_positions()
@@ -326,22 +406,50 @@ class TradingBot:
     async def async_place_tpsl(self,client, **kwargs):
         return client.place_tpsl(**kwargs)
 
-    async def open_positions(self,row):
+    def get_entry_size(self,row):
         coin = row['coin']
-        buyer = row['buyer']
-        instrument_id = row['instrument_id']
+        amount_step = self.instruments.amount_step(coin)
         hyper_balance = float(self.hyper_account['withdrawable'])*.2 # testing using 10%
-        hyper_liquid_mark_price = row['hyper_price'] 
-        hyper_size = get_quantity(leverage=self.leverage,price=hyper_liquid_mark_price,balance=hyper_balance,coin=coin)
+        hyper_size = get_quantity(leverage=self.leverage,price=row['hyper_price'],balance=hyper_balance,coin=coin,amount_step=amount_step)
         
         aevo_balance = float(self.aevo_account['collaterals'][0]['available_balance'])*.2 # testing using 10%
-        aevo_mark_price = row['aevo_price']
-        aevo_size = get_quantity(leverage=self.leverage,price=aevo_mark_price,balance=aevo_balance,coin=coin)
+        aevo_size = get_quantity(leverage=self.leverage,price=row['aevo_price'],balance=aevo_balance,coin=coin,amount_step=amount_step)
         
-        size = min(hyper_size,aevo_size)
+        return min(hyper_size,aevo_size)
+
+    def prepare_entry(self,row):
+        # keep signed aevo orders ready for the best candidate so entry only has to send them
+        try:
+            coin = row['coin']
+            is_buy = row['buyer'] == 'AEVO'
+            price_step = self.instruments.aevo_price_step(coin)
+            _, aevo_limit_px = self.fill_prices(coin,row['buyer'],row['hyper_price'],row['aevo_price'],limit=True)
+            self.aevo_presigner.set_candidate(
+                instrument_id=row['instrument_id'],
+                is_buy=is_buy,
+                limit_price=round_aevo_price(coin=coin,price=aevo_limit_px,buyer=is_buy,price_step=price_step),
+                quantity=self.get_entry_size(row),
+                price_step=price_step,
+                amount_step=self.instruments.amount_step(coin),
+            )
+        except Exception as e:
+            logger.info(f"Error preparing aevo entry {e}")
 
-        hyper_order = self.async_place_order(self.hyper_client,coin=coin,size=size,is_buy=buyer == 'HYPER_LIQUID',limit_px=hyper_liquid_mark_price)
-        aevo_order = self.async_place_order(self.aevo_client,instrument_id=instrument_id,is_buy=buyer == 'AEVO',reduce_only=False,quantity=size,limit_px=round_aevo_price(coin=coin,price=aevo_mark_price,buyer=buyer=='AEVO'))
+    async def open_positions(self,row):
+        coin = row['coin']
+        buyer = row['buyer']
+        instrument_id = row['instrument_id']
+        size = self.get_entry_size(row)
+        # limits reach the last book level our size needs, or the mark when there is no fresh book
+        hyper_limit_px, aevo_book_px = self.fill_prices(coin,buyer,row['hyper_price'],row['aevo_price'],limit=True)
+
+        aevo_is_buy = buyer == 'AEVO'
+        aevo_limit_px = round_aevo_price(coin=coin,price=aevo_book_px,buyer=aevo_is_buy,price_step=self.instruments.aevo_price_step(coin))
+        aevo_payload, aevo_order_id = self.aevo_presigner.take(instrument_id=instrument_id,is_buy=aevo_is_buy,limit_price=aevo_limit_px,quantity=size)
+        self.aevo_presigner.clear_candidate()
+
+        hyper_order = self.hyper_async.place_order(coin=coin,size=size,is_buy=buyer == 'HYPER_LIQUID',limit_px=hyper_limit_px)
+        aevo_order = self.aevo_ws.order_gateway.place_order(instrument_id=instrument_id,is_buy=aevo_is_buy,limit_price=aevo_limit_px,quantity=size,post_only=False,reduce_only=False,payload=aevo_payload,order_id=aevo_order_id)
         
         # hit them currently
         hyper_result , aevo_result = await asyncio.gather(hyper_order, aevo_order)
@@ -351,6 +459,10 @@ class TradingBot:
 
         await self.telegram_manager.send_message(message='Hyper Order Result /n' + str(hyper_result))
         await self.telegram_manager.send_message(message='Aevo Order Result/n' + str(aevo_result))
+        if not aevo_order_id and isinstance(aevo_result, dict):
+            aevo_order_id = aevo_result.get('order_id')
+        if aevo_order_id:
+            await self.check_aevo_entry(aevo_order_id)
 
         # # # get avg prices for both
         # avg_hyper_price = float(hyper_result['response']['data']['statuses'][0]['filled']['avgPx'])
@@ -364,7 +476,7 @@ class TradingBot:
         # low_price = low_price*(1.09)
         # high_price = high_price*(.91)
 
-        # hyper_tpsl = self.async_place_tpsl(self.hyper_client,coin=coin,size=size,is_buy=buyer == 'HYPER_LIQUID',low_price=low_price,high_price=high_price)
+        # hyper_tpsl = self.hyper_async.place_tpsl(coin=coin,size=size,is_buy=buyer == 'HYPER_LIQUID',low_price=low_price,high_price=high_price)
         # aevo_tpsl = self.async_place_tpsl(self.aevo_client,instrument_id=instrument_id,is_buy=buyer == 'AEVO',quantity=size,low_price=low_price,high_price=high_price)
 
         # hyper_tpsl_result , aevo_tpsl_result = await asyncio.gather(hyper_tpsl, aevo_tpsl)
@@ -372,8 +484,35 @@ class TradingBot:
         # get the accounts again to update df
         await self.get_accounts()
 
+    async def check_aevo_entry(self,order_id):
+        # the tracker follows the order on the orders and fills channels, an entry that didn't fill leaves the hyper leg unhedged
+        tracker = self.aevo_ws.order_tracker
+        order = await tracker.wait_for_update(order_id, timeout=AEVO_ENTRY_TIMEOUT, states={'partial'} | TERMINAL_STATES)
+        if order is None:
+            order = tracker.register(order_id)
+            if order.filled:
+                return order
+            # still resting with nothing filled, the price has moved away so take it off rather than fill late
+            logger.info(f'Cancelling unfilled aevo entry {order}')
+            await self.aevo_ws.cancel_order(order_id)
+        elif order.state in ('filled','partial'):
+            # a partial keeps working, the close cancels whatever is left of it
+            logger.info(f'Aevo entry {order}')
+            return order
+        logger.error(f'Aevo entry not filled ({order.state}), hyper leg unhedged {order}')
+        await self.telegram_manager.send_message(message=f'Aevo entry not filled ({order.state}), hyper leg unhedged\n{order}')
+        return order
+
+    async def cancel_aevo_orders(self,instrument_id):
+        # a resting entry remainder would open again what the close takes off
+        for order in self.aevo_ws.order_tracker.open_orders():
+            if str(order.instrument_id) == str(instrument_id):
+                logger.info(f'Cancelling open aevo order {order}')
+                await self.aevo_ws.cancel_order(order.order_id)
+
     async def stop(self):
         await self.hyper_ws.stop()
+        await self.hyper_async.close()
         await self.aevo_ws.stop()
         self.ws_started = False
 
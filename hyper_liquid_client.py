@@ -1,21 +1,156 @@
 import time
-import requests
 import json
 from eth_account import Account
 from eth_account.signers.local import LocalAccount
 import json
 import os
 from web3 import Web3
-from web3.middleware import geth_poa_middleware
 from loguru import logger
 
 from hyperliquid.exchange import Exchange
 from hyperliquid.info import Info
 from hyperliquid.utils import constants
+from hyperliquid.utils.signing import (
+    get_timestamp_ms,
+    order_request_to_order_wire,
+    order_wires_to_order_action,
+    sign_l1_action,
+)
 
 from trading_utils import round_price
+from fee_oracle import get_fee_oracle
+from nonce_manager import get_nonce_manager
+from web3_pool import erc20, get_web3
 from dotenv import load_dotenv
 
+
+def limit_order_request(coin:str,size:float,is_buy:bool,limit_px:float,tif='Gtc',reduce_only=False):
+    return {'coin': coin, 'is_buy': is_buy, 'sz': size, 'limit_px': round_price(limit_px), 'order_type': {'limit': {'tif': tif}}, 'reduce_only': reduce_only}
+
+
+def sl_order_request(coin:str,size:float,is_buy:bool,price:float):
+    trigger_price = price*(.91) if not is_buy else price*(1.09)
+    trigger_price = round_price(price,max_sig_figs=5, max_decimals=6)
+    stop_order_type = {"trigger": {"triggerPx": trigger_price, "isMarket": True, "tpsl": "sl"}}
+    return {'coin': coin, 'is_buy': not is_buy, 'sz': size, 'limit_px': trigger_price, 'order_type': stop_order_type, 'reduce_only': True}
+
+
+def tp_order_request(coin:str,size:float,is_buy:bool,price:float):
+    trigger_price = price*(.91) if not is_buy else price*(1.09)
+    trigger_price = round_price(trigger_price,max_sig_figs=5, max_decimals=6)
+    tp_order_type = {"trigger": {"triggerPx": trigger_price, "isMarket": True, "tpsl": "tp"}}
+    return {'coin': coin, 'is_buy': not is_buy, 'sz': size, 'limit_px': trigger_price, 'order_type': tp_order_type, 'reduce_only': True}
+
+
+def tpsl_order_requests(coin:str,size:float,is_buy:bool,low_price:float,high_price:float):
+    take_price = high_price if is_buy else low_price
+    stop_price = low_price if is_buy else high_price
+    return [sl_order_request(coin,size,is_buy,stop_price), tp_order_request(coin,size,is_buy,take_price)]
+
+
+def order_statuses(result, order_requests):
+    """Pairs each request of a bulk order with its entry in the response's ``statuses``.
+
+    Each status is a dict with ``coin``, ``is_buy``, ``sz`` and ``status`` (``resting``, ``filled``,
+    ``error`` or one of the ``waitingFor...`` states of grouped tpsl orders), plus ``oid``,
+    ``total_sz`` and ``avg_px`` when the exchange returned them.
+    """
+    if not isinstance(result, dict) or result.get('status') != 'ok':
+        error = result.get('response') if isinstance(result, dict) else result
+        statuses = [{'error': error}] * len(order_requests)
+    else:
+        statuses = result['response']['data']['statuses']
+    mapped = []
+    for order, status in zip(order_requests, statuses):
+        entry = {'coin': order['coin'], 'is_buy': order['is_buy'], 'sz': order['sz']}
+        if isinstance(status, str):
+            entry['status'] = status
+        elif 'error' in status:
+            entry['status'] = 'error'
+            entry['error'] = status['error']
+        else:
+            kind, data = next(iter(status.items()))
+            entry['status'] = kind
+            entry['oid'] = data.get('oid')
+            if 'totalSz' in data:
+                entry['total_sz'] = float(data['totalSz'])
+                entry['avg_px'] = float(data['avgPx'])
+        mapped.append(entry)
+    return mapped
+
+
+class AssetCtxSnapshot:
+    """Last ``metaAndAssetCtxs`` response, indexed by coin name.
+
+    The name index is only rebuilt when the universe changes. Each refresh just copies the
+    contexts and the funding, mark, open interest and premium arrays, so looking up k coins
+    costs O(k) instead of a walk over the whole universe.
+    """
+
+    def __init__(self) -> None:
+        self.names = ()
+        self.index = {}
+        # kPEPE style names also answer to PEPE, like the old coin.replace('k','') check
+        self.aliases = {}
+        self.ctxs = []
+        self.funding = []
+        self.mark = []
+        self.open_interest = []
+        self.premium = []
+        self.updated_at = 0
+
+    @staticmethod
+    def to_float(value):
+        return float(value) if value is not None else None
+
+    def update(self, meta_and_asset_ctxs):
+        universe = meta_and_asset_ctxs[0]['universe']
+        ctxs = meta_and_asset_ctxs[1]
+        names = tuple(asset['name'] for asset in universe)
+        if names != self.names:
+            self.build_index(names)
+        self.ctxs = ctxs
+        self.funding = [self.to_float(ctx.get('funding')) for ctx in ctxs]
+        self.mark = [self.to_float(ctx.get('markPx')) for ctx in ctxs]
+        self.open_interest = [self.to_float(ctx.get('openInterest')) for ctx in ctxs]
+        self.premium = [self.to_float(ctx.get('premium')) for ctx in ctxs]
+        self.updated_at = time.time()
+
+    def build_index(self, names):
+        self.names = names
+        self.index = {name: idx for idx, name in enumerate(names)}
+        self.aliases = {}
+        for idx, name in enumerate(names):
+            alias = name.replace('k', '')
+            if alias != name:
+                self.aliases.setdefault(alias, []).append(idx)
+        logger.info(f'Indexed {len(names)} hyper assets')
+
+    def indices(self, coins):
+        result = {}
+        for coin in coins:
+            idx = self.index.get(coin)
+            if idx is not None:
+                result[self.names[idx]] = idx
+            for idx in self.aliases.get(coin, ()):
+                result[self.names[idx]] = idx
+        return result
+
+    def get(self, coins):
+        return {name: self.ctxs[idx] for name, idx in self.indices(coins).items()}
+
+    def fields(self, coins):
+        return {
+            name: {
+                'funding': self.funding[idx],
+                'mark_price': self.mark[idx],
+                'open_interest': self.open_interest[idx],
+                'premium': self.premium[idx],
+            }
+            for name, idx in self.indices(coins).items()
+        }
+
+
 class HyperLiquidClient:
     def __init__(self):
         load_dotenv()
@@ -32,6 +167,7 @@ class HyperLiquidClient:
         
         self.info = Info(self.BASE_URL, skip_ws=True)
         self.exchange = Exchange(self.ACCOUNT, self.BASE_URL, account_address=self.ADDRESS)
+        self.asset_ctxs = AssetCtxSnapshot()
     
     def get_account(self) -> None:
         user_info = self.info.user_state(address=self.ADDRESS)
@@ -42,26 +178,15 @@ class HyperLiquidClient:
         logger.info(f'Updated leverage on Hyper for {coin}: {leverage}')
         return update_leveage_result
 
-    def get_funding(self,coins:list) -> None:
-        url = f"{self.BASE_URL}/info"
-        payload = json.dumps({"type": "metaAndAssetCtxs"})
-        headers = {'content-type': 'application/json'}
-        response = requests.request("POST", url, headers=headers, data=payload)
-
-        hyper = response.json()
-        universe = hyper[0]['universe']
-        funding = hyper[1]
+    def refresh_asset_ctxs(self):
+        # the info api has no contexts-only request, the snapshot skips re-indexing an unchanged universe
+        self.asset_ctxs.update(self.info.post("/info", {"type": "metaAndAssetCtxs"}))
+        return self.asset_ctxs
 
-        result = {}
-
-        for idx in range(0,len(universe)):
-            
-            coin = universe[idx]['name']
-            market_data = funding[idx]
-            if coin in coins or coin.replace('k','') in coins:
-                result[coin] = market_data
-
-        return result
+    def get_funding(self,coins:list,max_age:float=0) -> None:
+        if time.time() - self.asset_ctxs.updated_at >= max_age:
+            self.refresh_asset_ctxs()
+        return self.asset_ctxs.get(coins)
 
 
     def place_order(self,coin:str,size:float,is_buy:bool,limit_px:float):
@@ -75,30 +200,49 @@ class HyperLiquidClient:
             logger.info(f"Error opening hyper position. Error: {e}") 
         
     
-    def place_tpsl(self,coin:str,size:float,is_buy:bool,low_price:float,high_price:float):
-        take_price = high_price if is_buy else low_price
-        stop_price = low_price if is_buy else high_price
-        # place sl
-        stop_result = self.place_sl(coin=coin,size=size,is_buy=is_buy,price=stop_price)
-        # place tp
-        take_result = self.place_tp(coin=coin,size=size,is_buy=is_buy,price=take_price) 
-        
-        return order_result,stop_result,take_result
+    def bulk_orders(self,order_requests:list,grouping:str='na'):
+        """Sends ``order_requests`` as one signed order action, returns the raw response.
 
+        ``grouping`` is ``na`` for independent orders, ``normalTpsl`` for an entry followed by
+        its tp/sl or ``positionTpsl`` for tp/sl on the open position.
+        """
+        if grouping == 'na':
+            return self.exchange.bulk_orders(order_requests)
+        # the sdk always sends "na", build the same action with the requested grouping
+        exchange = self.exchange
+        order_wires = [order_request_to_order_wire(order, exchange.coin_to_asset[order['coin']]) for order in order_requests]
+        order_action = order_wires_to_order_action(order_wires)
+        order_action['grouping'] = grouping
+        timestamp = get_timestamp_ms()
+        signature = sign_l1_action(exchange.wallet, order_action, exchange.vault_address, timestamp, exchange.base_url == constants.MAINNET_API_URL)
+        return exchange._post_action(order_action, signature, timestamp)
 
-    def place_sl(self,coin:str,size:float,is_buy:bool,price:float):
-        trigger_price = price*(.91) if not is_buy else price*(1.09)
-        trigger_price = round_price(price,max_sig_figs=5, max_decimals=6)
+    def place_orders(self,order_requests:list,grouping:str='na'):
+        logger.info(f"Creating {len(order_requests)} hyper orders for {sorted({order['coin'] for order in order_requests})}")
+        try:
+            result = self.bulk_orders(order_requests,grouping=grouping)
+        except Exception as e:
+            logger.info(f"Error placing hyper orders. Error: {e}")
+            result = {'status': 'err', 'response': str(e)}
+        return order_statuses(result, order_requests)
+
+    def place_entry_with_tpsl(self,coin:str,size:float,is_buy:bool,limit_px:float,low_price:float,high_price:float):
+        # entry, sl and tp in one round trip, the tp/sl only activate once the entry fills
+        order_requests = [limit_order_request(coin,size,is_buy,limit_px)] + tpsl_order_requests(coin,size,is_buy,low_price,high_price)
+        entry_status, stop_status, take_status = self.place_orders(order_requests,grouping='normalTpsl')
+        return entry_status, stop_status, take_status
+
+    def place_tpsl(self,coin:str,size:float,is_buy:bool,low_price:float,high_price:float):
+        # sl and tp in one signed action
+        stop_status, take_status = self.place_orders(tpsl_order_requests(coin,size,is_buy,low_price,high_price))
+        return stop_status, take_status
 
-        stop_order_type = {"trigger": {"triggerPx": trigger_price, "isMarket": True, "tpsl": "sl"}}
-        stop_result = self.exchange.order(coin=coin, is_buy=not is_buy, sz=size, limit_px=trigger_price, order_type=stop_order_type, reduce_only=True)
+    def place_sl(self,coin:str,size:float,is_buy:bool,price:float):
+        stop_result = self.exchange.bulk_orders([sl_order_request(coin,size,is_buy,price)])
         return stop_result
 
     def place_tp(self,coin:str,size:float,is_buy:bool,price:float):
-        trigger_price = price*(.91) if not is_buy else price*(1.09)
-        trigger_price = round_price(trigger_price,max_sig_figs=5, max_decimals=6)
-        tp_order_type = {"trigger": {"triggerPx": trigger_price, "isMarket": True, "tpsl": "tp"}}
-        take_result = self.exchange.order(coin=coin, is_buy=not is_buy, sz=size, limit_px=trigger_price, order_type=tp_order_type, reduce_only=True)
+        take_result = self.exchange.bulk_orders([tp_order_request(coin,size,is_buy,price)])
         return take_result
 
     def close_position(self,coin:str):
@@ -114,52 +258,18 @@ class HyperLiquidClient:
         print(withdraw_result)
 
 
-    def deposit(self,amount:float) -> None:
+    def deposit(self,amount:float):
         # Connect to the Arbitrum node
-        web3 = Web3(Web3.HTTPProvider(self.NODE_URL))
-        web3.middleware_onion.inject(geth_poa_middleware, layer=0)  # Needed for some Ethereum testnets and sidechains like Arbitrum
-
-        # Check connection
-        if not web3.is_connected():
-            print("Failed to connect to the Ethereum network!")
-            exit()
-
-        # Define the ABI for the ERC20 transfer function
-        abi = [
-            {
-                "constant": False,
-                "inputs": [
-                    {
-                        "name": "_to",
-                        "type": "address"
-                    },
-                    {
-                        "name": "_value",
-                        "type": "uint256"
-                    }
-                ],
-                "name": "transfer",
-                "outputs": [
-                    {
-                        "name": "",
-                        "type": "bool"
-                    }
-                ],
-                "payable": False,
-                "stateMutability": "nonpayable",
-                "type": "function"
-            },
-        ]
-
-        # Setup the contract
-        contract = web3.eth.contract(address=self.USDC_CONTRACT_ADDRESS, abi=abi)
-
-        # Transaction details
+        web3 = get_web3(self.NODE_URL)
+        contract = erc20(web3, self.USDC_CONTRACT_ADDRESS)
+
+        # Transaction details, fees and the gas limit come from the oracle without a round trip
+        oracle = get_fee_oracle(self.NODE_URL)
         tx = {
             'chainId': 42161,  # Arbitrum One chain ID
-            'gas': 200000,
-            'gasPrice': web3.eth.gas_price,
-            'nonce': web3.eth.get_transaction_count(self.ADDRESS),
+            'from': self.ADDRESS,
+            'gas': 0,
+            **oracle.fees(),
         }
 
         # Create transaction
@@ -167,16 +277,22 @@ class HyperLiquidClient:
             self.HYPER_ADDRESS,
             int(amount * (10**6))
         ).build_transaction(tx)
+        usdc_transfer['gas'] = oracle.gas_limit(usdc_transfer)
 
-        # Sign the transaction
-        signed_tx = web3.eth.account.sign_transaction(usdc_transfer, private_key=self.SECRET_KEY)
-
-        # Send the transaction
-        tx_hash = web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        # Sign and send with a locally counted nonce
+        nonces = get_nonce_manager(self.NODE_URL, self.ADDRESS)
+        tx_hash = nonces.send(usdc_transfer, self.SECRET_KEY)
 
         # Print the transaction hash
         print(f'Transaction hash: {tx_hash.hex()}')
 
+        # the receipt tells the oracle whether the gas limit held
+        receipt = nonces.wait(tx_hash)
+        oracle.observe(receipt, usdc_transfer)
+        if receipt['status'] != 1:
+            logger.error(f'Hyper deposit failed {tx_hash.hex()}')
+        return receipt
+
 
 if __name__ == '__main__':
     # hyper_order(coin='ETH',size=0.01,is_buy=True)
@@ -3,16 +3,86 @@ import websockets
 import json
 from loguru import logger
 from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
 
 import os
 from dotenv import load_dotenv
 
+
+class HyperOrderUpdate(NamedTuple):
+    coin: str
+    oid: int
+    is_buy: bool
+    limit_px: float
+    sz: float
+    orig_sz: float
+    status: str
+    timestamp: int
+    cloid: Optional[str] = None
+
+
+class HyperFill(NamedTuple):
+    coin: str
+    oid: int
+    tid: int
+    is_buy: bool
+    px: float
+    sz: float
+    fee: float
+    closed_pnl: float
+    crossed: bool
+    direction: str
+    time: int
+    snapshot: bool = False  # replayed by the first userFills frame of a connection
+
+
+def decode_order_updates(data):
+    updates = []
+    for update in data:
+        order = update['order']
+        updates.append(HyperOrderUpdate(
+            coin=order['coin'],
+            oid=order['oid'],
+            is_buy=order['side'] == 'B',
+            limit_px=float(order['limitPx']),
+            sz=float(order['sz']),
+            orig_sz=float(order.get('origSz', order['sz'])),
+            status=update['status'],
+            timestamp=update.get('statusTimestamp', order.get('timestamp')),
+            cloid=order.get('cloid'),
+        ))
+    return updates
+
+
+def decode_user_fills(data):
+    snapshot = bool(data.get('isSnapshot'))
+    return [
+        HyperFill(
+            coin=fill['coin'],
+            oid=fill['oid'],
+            tid=fill.get('tid'),
+            is_buy=fill['side'] == 'B',
+            px=float(fill['px']),
+            sz=float(fill['sz']),
+            fee=float(fill.get('fee', 0)),
+            closed_pnl=float(fill.get('closedPnl', 0)),
+            crossed=fill.get('crossed', False),
+            direction=fill.get('dir'),
+            time=fill['time'],
+            snapshot=snapshot,
+        )
+        for fill in data.get('fills', [])
+    ]
+
+
 class HyperLiquidWebSocket:
-    def __init__(self, message_callback) -> None:
+    def __init__(self, message_callback, order_callback=None) -> None:
         load_dotenv()
         self.ADDRESS = os.environ.get('address')
         self.BASE_URI = "wss://api-ui.hyperliquid.xyz/ws"
         self.message_callback = message_callback
+        # receives HyperOrderUpdate and HyperFill records from the user connection
+        self.order_callback = order_callback
         self.websockets = {}
         self.last_message_time = {}
 
@@ -38,6 +108,14 @@ class HyperLiquidWebSocket:
             }
         }
         await websocket.send(json.dumps(subscribe_message))
+        book_message = {
+            "method": "subscribe",
+            "subscription": {
+                "type": "l2Book",
+                "coin": coin
+            }
+        }
+        await websocket.send(json.dumps(book_message))
         logger.info(f"Sent subscription for {coin}")
 
     async def connect_and_subscribe_web2(self):
@@ -48,15 +126,36 @@ class HyperLiquidWebSocket:
             await self.handle_update(websocket,'User')
 
     async def subscribe_web2(self, websocket):
-        subscribe_message = {
-            "method": "subscribe",
-            "subscription": {
-                "type": "webData2",
-                "user": self.ADDRESS
+        # order updates and fills share the user connection with webData2
+        for subscription_type in ("webData2", "orderUpdates", "userFills"):
+            subscribe_message = {
+                "method": "subscribe",
+                "subscription": {
+                    "type": subscription_type,
+                    "user": self.ADDRESS
+                }
             }
-        }
-        await websocket.send(json.dumps(subscribe_message))
-        logger.info("Sent subscription for web2 data")
+            await websocket.send(json.dumps(subscribe_message))
+        logger.info("Sent subscription for web2 data, order updates and fills")
+
+    async def handle_order_message(self, msg):
+        """Decodes orderUpdates and userFills frames for the order callback. Returns True if the frame was one."""
+        channel = msg.get('channel')
+        if channel == 'orderUpdates':
+            records = decode_order_updates(msg['data'])
+        elif channel == 'userFills':
+            # the first frame replays recent fills, which covers fills missed while reconnecting,
+            # the callback dedups them by tid
+            records = decode_user_fills(msg['data'])
+        else:
+            return False
+        if self.order_callback:
+            for record in records:
+                try:
+                    await self.order_callback(record)
+                except Exception as e:
+                    logger.error(f"Error in hyper order callback: {e}")
+        return True
 
     async def handle_update(self, websocket,coin):
         try:
@@ -67,6 +166,8 @@ class HyperLiquidWebSocket:
                     self.last_message_time[coin] = datetime.now()
                 except:
                     continue
+                if coin == 'User' and await self.handle_order_message(msg):
+                    continue
                 await self.message_callback(msg)
         except websockets.exceptions.ConnectionClosed as e:
             logger.warning(f"Connection closed: {e}")
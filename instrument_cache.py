@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import time
+import requests
+from loguru import logger
+
+from hyperliquid.utils import constants
+
+from trading_utils import get_amount_step, get_aevo_price_step
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instrument_cache.json')
+TIMEOUT = 10
+MAX_RETRY_DELAY = 30 * 60
+
+
+class InstrumentCache:
+    """Instrument metadata for Aevo perpetuals and Hyperliquid assets.
+
+    Loaded once at startup from ``cache_file`` (or the venues when the file is missing or older
+    than ``ttl`` seconds), then served from dicts keyed by the bot's coin names. After that every
+    refresh runs on a background thread, backing off after failures, so lookups made from the
+    event loop never wait on the venues; a coin that isn't loaded yet is simply a miss.
+    """
+
+    def __init__(self, cache_file=CACHE_FILE, ttl=6 * 60 * 60) -> None:
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.aevo = {}
+        self.hyper = {}
+        self.loaded_at = 0
+        self.failures = 0
+        self.retry_at = 0
+        self.refreshing = threading.Lock()
+        self.AEVO_URL = "https://api.aevo.xyz"
+        self.HYPER_URL = constants.MAINNET_API_URL
+        self.load()
+
+    @staticmethod
+    def aevo_asset(coin:str):
+        # kPEPE on hyperliquid trades as 1000PEPE on aevo
+        if coin[0] == 'k':
+            return coin.replace('k', '1000')
+        return coin
+
+    @staticmethod
+    def hyper_coin(asset:str):
+        # the reverse of aevo_asset, so aevo data is keyed by the bot's coin names
+        if asset.startswith('1000'):
+            return 'k' + asset[4:]
+        return asset
+
+    def load(self):
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r') as file:
+                    cached = json.load(file)
+                self.aevo = cached['aevo']
+                self.hyper = cached['hyper']
+                self.loaded_at = cached['loaded_at']
+            except Exception as e:
+                logger.info(f"Error reading instrument cache {e}")
+        if self.is_stale():
+            # the only refresh that blocks, before any lookup is made
+            self.refresh()
+
+    def save(self):
+        with open(self.cache_file, 'w') as file:
+            json.dump({'aevo': self.aevo, 'hyper': self.hyper, 'loaded_at': self.loaded_at}, file)
+
+    def is_stale(self):
+        return time.time() - self.loaded_at > self.ttl
+
+    def ensure_fresh(self):
+        if not self.is_stale() or time.time() < self.retry_at:
+            return
+        if not self.refreshing.locked():
+            threading.Thread(target=self.refresh, daemon=True).start()
+
+    def refresh(self):
+        if not self.refreshing.acquire(blocking=False):
+            return
+        try:
+            self.fetch_all()
+        finally:
+            self.refreshing.release()
+
+    def fetch_all(self):
+        try:
+            aevo = self.fetch_aevo()
+            hyper = self.fetch_hyper()
+        except Exception as e:
+            # keep serving what we have and try again later, backing off while the venues are down
+            delay = min(60 * 2 ** self.failures, MAX_RETRY_DELAY)
+            self.failures += 1
+            self.retry_at = time.time() + delay
+            logger.info(f"Error refreshing instrument cache {e}, retrying in {delay}s")
+            return
+        self.aevo = aevo
+        self.hyper = hyper
+        self.loaded_at = time.time()
+        self.failures = 0
+        self.retry_at = 0
+        self.save()
+        logger.info(f"Loaded {len(self.aevo)} aevo and {len(self.hyper)} hyper instruments")
+
+    def fetch_aevo(self):
+        response = requests.get(f"{self.AEVO_URL}/markets?instrument_type=PERPETUAL", headers={"accept": "application/json"}, timeout=TIMEOUT)
+        markets = {}
+        for market in response.json():
+            markets[market['underlying_asset']] = {
+                'instrument_id': int(market['instrument_id']),
+                'instrument_name': market['instrument_name'],
+                'price_step': float(market['price_step']),
+                'amount_step': float(market['amount_step']),
+            }
+        return markets
+
+    def fetch_hyper(self):
+        response = requests.post(f"{self.HYPER_URL}/info", json={"type": "meta"}, headers={'content-type': 'application/json'}, timeout=TIMEOUT)
+        assets = {}
+        for asset, asset_info in enumerate(response.json()['universe']):
+            assets[asset_info['name']] = {
+                'asset': asset,
+                'sz_decimals': int(asset_info['szDecimals']),
+                'max_leverage': asset_info.get('maxLeverage'),
+            }
+        return assets
+
+    def aevo_market(self, coin:str):
+        self.ensure_fresh()
+        return self.aevo.get(self.aevo_asset(coin))
+
+    def hyper_asset(self, coin:str):
+        self.ensure_fresh()
+        return self.hyper.get(coin)
+
+    def instrument_id(self, coin:str):
+        market = self.aevo_market(coin)
+        return market['instrument_id'] if market else None
+
+    def aevo_price_step(self, coin:str):
+        market = self.aevo_market(coin)
+        return market['price_step'] if market else get_aevo_price_step(coin)
+
+    def sz_decimals(self, coin:str):
+        asset = self.hyper_asset(coin)
+        return asset['sz_decimals'] if asset else None
+
+    def amount_step(self, coin:str):
+        # both legs get the same size, so use the coarser of the two venues' lot sizes
+        steps = []
+        market = self.aevo_market(coin)
+        if market:
+            steps.append(market['amount_step'])
+        sz_decimals = self.sz_decimals(coin)
+        if sz_decimals is not None:
+            steps.append(10 ** -sz_decimals)
+        return max(steps) if steps else get_amount_step(coin)
@@ -0,0 +1,152 @@
+import threading
+import time
+from typing import NamedTuple
+
+from eth_abi import decode
+from web3 import Web3
+
+from web3_pool import USDC, USDC_E, erc20, get_contract
+
+MULTICALL3 = Web3.to_checksum_address('0xcA11bde05977b3631167028862bE2a173976CA11')
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"}
+                ],
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"}
+                ],
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "getBlockNumber",
+        "outputs": [{"name": "blockNumber", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "addr", "type": "address"}],
+        "name": "getEthBalance",
+        "outputs": [{"name": "balance", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+]
+
+
+class WalletState(NamedTuple):
+    """Everything read for one wallet in a single aggregate3 call, amounts in raw token units."""
+    owner: str
+    block_number: int
+    eth: int
+    balances: dict  # token -> balance
+    allowances: dict  # (token, spender) -> allowance
+    fetched_at: float
+
+    def covers(self, tokens, spenders):
+        return all(token in self.balances for token in tokens) and all(key in self.allowances for key in spenders)
+
+
+class MulticallReader:
+    """Reads ETH, token balances and allowances for a wallet through Multicall3 in one ``eth_call``.
+
+    The block number comes back in the same call, and states are cached per wallet for ``ttl``
+    seconds. Callers that need to see a given transaction pass ``min_block``, and anything read
+    before that block is fetched again.
+    """
+
+    def __init__(self, web3, tokens=(USDC, USDC_E), ttl:float=2) -> None:
+        self.web3 = web3
+        self.tokens = tuple(Web3.to_checksum_address(token) for token in tokens)
+        self.ttl = ttl
+        self.multicall = get_contract(web3, MULTICALL3, MULTICALL3_ABI)
+        self.states = {}  # owner -> WalletState
+        self.block_number_call = self.multicall.encodeABI(fn_name='getBlockNumber')
+
+    def invalidate(self, owner:str=None):
+        if owner is None:
+            self.states.clear()
+        else:
+            self.states.pop(Web3.to_checksum_address(owner), None)
+
+    def cached(self, owner, tokens, spenders, min_block):
+        state = self.states.get(owner)
+        if state is None or state.block_number < min_block or time.time() - state.fetched_at > self.ttl:
+            return None
+        return state if state.covers(tokens, spenders) else None
+
+    def request(self, owner, tokens, spenders):
+        tokens = tuple(Web3.to_checksum_address(token) for token in tokens or self.tokens)
+        spenders = tuple((Web3.to_checksum_address(token), Web3.to_checksum_address(spender)) for token, spender in spenders)
+        return Web3.to_checksum_address(owner), tokens, spenders
+
+    def calls(self, owner, tokens, spenders):
+        calls = [
+            (MULTICALL3, False, self.block_number_call),
+            (MULTICALL3, False, self.multicall.encodeABI(fn_name='getEthBalance', args=[owner])),
+        ]
+        calls += [(token, False, erc20(self.web3, token).encodeABI(fn_name='balanceOf', args=[owner])) for token in tokens]
+        calls += [(token, False, erc20(self.web3, token).encodeABI(fn_name='allowance', args=[owner, spender])) for token, spender in spenders]
+        return calls
+
+    def decode(self, owner, tokens, spenders, results):
+        values = [decode(['uint256'], data)[0] for _, data in results]
+        block_number, eth = values[0], values[1]
+        balances = dict(zip(tokens, values[2:2 + len(tokens)]))
+        allowances = dict(zip(spenders, values[2 + len(tokens):]))
+        state = WalletState(owner, block_number, eth, balances, allowances, time.time())
+        previous = self.states.get(owner)
+        if previous is not None and previous.block_number == block_number:
+            # same block, keep what the earlier read had and this one didn't ask for
+            state = state._replace(balances={**previous.balances, **balances}, allowances={**previous.allowances, **allowances})
+        self.states[owner] = state
+        return state
+
+    def read(self, owner:str, tokens=None, spenders=(), min_block:int=0) -> WalletState:
+        """Blocking read, for a sync Web3."""
+        owner, tokens, spenders = self.request(owner, tokens, spenders)
+        state = self.cached(owner, tokens, spenders, min_block)
+        if state is None:
+            results = self.multicall.functions.aggregate3(self.calls(owner, tokens, spenders)).call()
+            state = self.decode(owner, tokens, spenders, results)
+        return state
+
+    async def read_async(self, owner:str, tokens=None, spenders=(), min_block:int=0) -> WalletState:
+        """Same as read, for an AsyncWeb3."""
+        owner, tokens, spenders = self.request(owner, tokens, spenders)
+        state = self.cached(owner, tokens, spenders, min_block)
+        if state is None:
+            results = await self.multicall.functions.aggregate3(self.calls(owner, tokens, spenders)).call()
+            state = self.decode(owner, tokens, spenders, results)
+        return state
+
+
+_lock = threading.Lock()
+_readers = {}
+
+
+def get_reader(web3) -> MulticallReader:
+    """One reader per pooled web3, so every caller shares its cache."""
+    with _lock:
+        reader = _readers.get(id(web3))
+        if reader is None or reader.web3 is not web3:
+            reader = _readers[id(web3)] = MulticallReader(web3)
+        return reader
@@ -0,0 +1,136 @@
+import threading
+
+from loguru import logger
+from web3 import Web3
+from web3.exceptions import TimeExhausted
+
+from web3_pool import get_web3
+
+# node errors on send, matched on the lowercased message
+ALREADY_KNOWN = ('already known', 'known transaction')  # the same signed tx is already in the pool
+NONCE_TOO_LOW = ('nonce too low',)
+
+
+class NonceManager:
+    """Hands out nonces for one wallet locally, so dependent transactions can go out back to back.
+
+    The first nonce is the chain's pending count, after that it is counted here. When a send
+    fails, or a receipt never comes, the count is dropped and read from the chain again on the
+    next reservation. Nonces reserved but not yet sent are never handed out twice, even after
+    a reset reads a pending count that doesn't include them yet.
+    """
+
+    def __init__(self, web3, address:str) -> None:
+        self.web3 = web3
+        self.address = Web3.to_checksum_address(address)
+        self.next_nonce = None
+        self.in_flight = set()
+        self.lock = threading.Lock()
+
+    def take(self, chain_nonce):
+        with self.lock:
+            if self.next_nonce is None or chain_nonce is not None and chain_nonce > self.next_nonce:
+                self.next_nonce = chain_nonce
+            while self.next_nonce in self.in_flight:
+                self.next_nonce += 1
+            nonce = self.next_nonce
+            self.next_nonce += 1
+            self.in_flight.add(nonce)
+            return nonce
+
+    def release(self, nonce:int):
+        """Called once ``nonce``'s send returned, from then on the pending count covers it."""
+        with self.lock:
+            self.in_flight.discard(nonce)
+
+    def reserve(self) -> int:
+        chain_nonce = self.web3.eth.get_transaction_count(self.address, 'pending') if self.next_nonce is None else None
+        return self.take(chain_nonce)
+
+    async def reserve_async(self, web3) -> int:
+        """Same as reserve, reading the chain through the caller's AsyncWeb3."""
+        chain_nonce = await web3.eth.get_transaction_count(self.address, 'pending') if self.next_nonce is None else None
+        return self.take(chain_nonce)
+
+    def reset(self):
+        logger.info(f"Resetting nonce for {self.address}")
+        with self.lock:
+            self.next_nonce = None
+
+    def failed(self, error, signed_tx, retry:bool):
+        """Handles a failed send, returns the hash if the transaction went out after all.
+
+        Otherwise the count is read again and it returns None if the send should be retried
+        with a new nonce, or raises ``error``.
+        """
+        message = str(error).lower()
+        if any(known in message for known in ALREADY_KNOWN):
+            return signed_tx.hash
+        self.reset()
+        if retry and any(low in message for low in NONCE_TOO_LOW):
+            logger.warning(f"Nonce too low for {self.address}, retrying with the pending count")
+            return None
+        raise error
+
+    def send(self, tx, private_key:str):
+        """Signs ``tx`` with the next nonce and sends it, returns the hash."""
+        for retry in (True, False):
+            tx['nonce'] = self.reserve()
+            signed_tx = self.web3.eth.account.sign_transaction(tx, private_key=private_key)
+            try:
+                return self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            except Exception as e:
+                tx_hash = self.failed(e, signed_tx, retry)
+                if tx_hash is not None:
+                    return tx_hash
+            finally:
+                self.release(tx['nonce'])
+
+    async def send_async(self, web3, tx, private_key:str):
+        for retry in (True, False):
+            tx['nonce'] = await self.reserve_async(web3)
+            signed_tx = web3.eth.account.sign_transaction(tx, private_key=private_key)
+            try:
+                return await web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            except Exception as e:
+                tx_hash = self.failed(e, signed_tx, retry)
+                if tx_hash is not None:
+                    return tx_hash
+            finally:
+                self.release(tx['nonce'])
+
+    def wait(self, tx_hash, timeout:float=120):
+        """Waits for the receipt of a transaction sent here.
+
+        When it doesn't come the transaction may have been dropped, leaving a gap the local count
+        would keep building on, so the count is read from the chain again.
+        """
+        try:
+            return self.web3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+        except TimeExhausted:
+            self.reset()
+            raise
+
+    async def wait_async(self, web3, tx_hash, timeout:float=120):
+        try:
+            return await web3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+        except TimeExhausted:
+            self.reset()
+            raise
+
+
+_lock = threading.Lock()
+_managers = {}
+
+
+def get_nonce_manager(endpoint:str, address:str) -> NonceManager:
+    """One manager per wallet, shared by the sync and async clients.
+
+    Every endpoint here is Arbitrum, so the count is per address whichever endpoint reads it first.
+    """
+    key = Web3.to_checksum_address(address)
+    with _lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = NonceManager(get_web3(endpoint), address)
+        return manager
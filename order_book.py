@@ -0,0 +1,205 @@
+import time
+from bisect import bisect_left
+
+
+class BookSide:
+    """One side of a book as parallel sorted arrays, best level first.
+
+    Bids are keyed by negative price so both sides sort ascending from the best level, and a
+    level lookup is a bisect.
+    """
+
+    def __init__(self, is_bid:bool) -> None:
+        self.is_bid = is_bid
+        self.keys = []
+        self.prices = []
+        self.sizes = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def key(self, price:float):
+        return -price if self.is_bid else price
+
+    def clear(self):
+        self.keys = []
+        self.prices = []
+        self.sizes = []
+
+    def load(self, levels):
+        """Replaces the side with ``levels``, an iterable of ``(price, size)``."""
+        levels = sorted((self.key(price), price, size) for price, size in levels if size > 0)
+        self.keys = [level[0] for level in levels]
+        self.prices = [level[1] for level in levels]
+        self.sizes = [level[2] for level in levels]
+
+    def set(self, price:float, size:float):
+        """Sets the size at ``price``, a size of 0 removes the level."""
+        key = self.key(price)
+        idx = bisect_left(self.keys, key)
+        exists = idx < len(self.keys) and self.keys[idx] == key
+        if size > 0:
+            if exists:
+                self.sizes[idx] = size
+            else:
+                self.keys.insert(idx, key)
+                self.prices.insert(idx, price)
+                self.sizes.insert(idx, size)
+        elif exists:
+            del self.keys[idx]
+            del self.prices[idx]
+            del self.sizes[idx]
+
+    def best(self):
+        if not self.keys:
+            return None
+        return self.prices[0], self.sizes[0]
+
+    def walk(self, size:float):
+        """Takes ``size`` from the best levels.
+
+        Returns ``(vwap, filled, worst_price)``, only touching the levels needed.
+        """
+        remaining = size
+        notional = 0.0
+        worst_price = None
+        prices = self.prices
+        sizes = self.sizes
+        for idx in range(len(prices)):
+            take = sizes[idx] if sizes[idx] < remaining else remaining
+            notional += take * prices[idx]
+            remaining -= take
+            worst_price = prices[idx]
+            if remaining <= 0:
+                break
+        filled = size - remaining
+        if not filled:
+            return None, 0.0, None
+        return notional / filled, filled, worst_price
+
+
+class OrderBook:
+    def __init__(self, coin:str) -> None:
+        self.coin = coin
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.updated_at = 0
+        self.exchange_time = None
+        self.synced = False  # deltas only apply on top of a snapshot
+
+    def apply_snapshot(self, bids, asks, exchange_time=None):
+        self.bids.load(bids)
+        self.asks.load(asks)
+        self.synced = True
+        self.touch(exchange_time)
+
+    def apply_delta(self, bids, asks, exchange_time=None):
+        """Applies an update on top of the last snapshot.
+
+        An update older than the last one, or one that leaves the book crossed, means a frame was
+        missed. The book is emptied then and ignores updates until the next snapshot.
+        """
+        if not self.synced:
+            return
+        if exchange_time is not None and self.exchange_time is not None and int(exchange_time) < int(self.exchange_time):
+            self.desync()
+            return
+        for price, size in bids:
+            self.bids.set(price, size)
+        for price, size in asks:
+            self.asks.set(price, size)
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is not None and ask is not None and bid >= ask:
+            self.desync()
+            return
+        self.touch(exchange_time)
+
+    def desync(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.synced = False
+
+    def touch(self, exchange_time):
+        self.updated_at = time.time()
+        self.exchange_time = exchange_time
+
+    def is_fresh(self, max_age:float):
+        return bool(self.bids) and bool(self.asks) and time.time() - self.updated_at <= max_age
+
+    def best_bid(self):
+        best = self.bids.best()
+        return best[0] if best else None
+
+    def best_ask(self):
+        best = self.asks.best()
+        return best[0] if best else None
+
+    def mid(self):
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    def vwap(self, is_buy:bool, size:float):
+        """Average fill price of a market order for ``size``, or None if the book is too thin."""
+        avg_price, filled, _ = (self.asks if is_buy else self.bids).walk(size)
+        return avg_price if filled >= size else None
+
+    def limit_price(self, is_buy:bool, size:float):
+        """The worst level a marketable limit order for ``size`` has to reach, or None."""
+        _, filled, worst_price = (self.asks if is_buy else self.bids).walk(size)
+        return worst_price if filled >= size else None
+
+
+class OrderBooks:
+    """Local mirrors of the Hyperliquid ``l2Book`` and Aevo ``orderbook`` channels, keyed by coin.
+
+    Aevo books are keyed by the Hyperliquid name through ``instruments`` (1000PEPE is kPEPE), so
+    both venues' books for a coin are found under the same key.
+    """
+
+    def __init__(self, instruments=None) -> None:
+        self.books = {}
+        self.instruments = instruments
+
+    def get(self, coin:str):
+        return self.books.get(coin)
+
+    def book(self, coin:str):
+        book = self.books.get(coin)
+        if book is None:
+            book = self.books[coin] = OrderBook(coin)
+        return book
+
+    def fresh(self, coin:str, max_age:float):
+        book = self.books.get(coin)
+        return book if book is not None and book.is_fresh(max_age) else None
+
+    def apply_hyper_l2(self, data):
+        # l2Book frames are always full snapshots, levels are [bids, asks] of {'px', 'sz', 'n'}
+        bids, asks = data['levels']
+        book = self.book(data['coin'])
+        book.apply_snapshot(
+            [(float(level['px']), float(level['sz'])) for level in bids],
+            [(float(level['px']), float(level['sz'])) for level in asks],
+            data.get('time'),
+        )
+        return book
+
+    def apply_aevo_orderbook(self, data):
+        """Applies an Aevo frame, returns the book or None when this frame put it out of sync."""
+        # levels are [price, amount, iv], an amount of 0 in an update removes the level
+        coin = data['instrument_name'].split('-')[0]
+        if self.instruments is not None:
+            coin = self.instruments.hyper_coin(coin)
+        book = self.book(coin)
+        synced = book.synced
+        bids = [(float(level[0]), float(level[1])) for level in data.get('bids', [])]
+        asks = [(float(level[0]), float(level[1])) for level in data.get('asks', [])]
+        if data.get('type') == 'snapshot':
+            book.apply_snapshot(bids, asks, data.get('last_updated'))
+        else:
+            book.apply_delta(bids, asks, data.get('last_updated'))
+        if synced and not book.synced:
+            return None
+        return book
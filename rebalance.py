@@ -1,62 +1,238 @@
 import asyncio
+import json
+import os
 import time
+from loguru import logger
 # hyper functions
 # aevo functions
 from eth_account_client import EthAccountClient
 # util
 from trading_utils import amount_to_withdraw
 
+HYPER_TO_AEVO = 'hyper_to_aevo'
+AEVO_TO_HYPER = 'aevo_to_hyper'
+ARRIVAL_TIMEOUT = 2 * 60 * 60  # seconds after the withdraw before the rebalance counts as stalled
+BALANCE_RETRIES = 5
+
+
+class Rebalancer:
+    """Moves collateral between the venues as withdraw -> await arrival -> swap -> deposit.
+
+    Every step runs its blocking web3, swap and SDK calls in a worker thread and waits with
+    ``asyncio.sleep``, so the feeds and risk checks keep running. Progress is written to
+    ``state_file`` after each step. A step that moves funds is marked as started before it is
+    sent, and after a crash it is never sent again, the machine goes on to check balances instead.
+    Arrival is picked up from the token's Transfer logs within about a block, ``poll_interval``
+    is only the fallback balance check. One instance runs one rebalance at a time, a ``run`` made
+    while another is in progress returns None. A withdraw that hasn't arrived after
+    ``arrival_timeout`` seconds leaves the state at 'stalled' and calls ``alert``, nothing runs
+    again until someone looks at it and removes the state file.
+    """
+
+    def __init__(self, hyper_client, aevo_client, state_file='rebalance_state.json', poll_interval=60, eth_account_client=None, watcher=None, arrival_timeout=ARRIVAL_TIMEOUT, alert=None) -> None:
+        self.hyper_client = hyper_client
+        self.aevo_client = aevo_client
+        self.state_file = state_file
+        self.poll_interval = poll_interval
+        self.arrival_timeout = arrival_timeout
+        self.alert = alert  # async callable taking a message, e.g. TelegramManager.send_message
+        self.eth_account_client = eth_account_client or EthAccountClient()
+        self.watcher = watcher or self.eth_account_client.arrival_watcher()
+        self.state = self.load()
+        self.lock = asyncio.Lock()
+
+    def load(self):
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r') as file:
+                    return json.load(file)
+            except Exception as e:
+                logger.info(f"Error reading rebalance state {e}")
+        return None
+
+    def save(self):
+        # write then rename so a crash never leaves half a state file
+        tmp_file = f'{self.state_file}.tmp'
+        with open(tmp_file, 'w') as file:
+            json.dump(self.state, file)
+        os.replace(tmp_file, self.state_file)
+
+    @property
+    def pending(self):
+        return self.state is not None and self.state['step'] not in ('done', 'stalled')
+
+    @property
+    def stalled(self):
+        return self.state is not None and self.state['step'] == 'stalled'
+
+    async def notify(self, message):
+        logger.error(message)
+        if self.alert:
+            try:
+                await self.alert(message)
+            except Exception as e:
+                logger.error(f"Error sending rebalance alert {e}")
+
+    def transition(self, step, **fields):
+        self.state.update(fields, step=step, updated_at=time.time())
+        self.save()
+        logger.info(f"Rebalance {self.state['direction']} -> {step}")
+
+    def plan(self, hyper_account, aevo_account):
+        aevo_balance = float(aevo_account['balance'])
+        hyper_balance = float(hyper_account['withdrawable'])
+        # get the difference from both
+        difference = hyper_balance - aevo_balance
+        if difference > 1:
+            direction = HYPER_TO_AEVO
+            withdraw_amount = amount_to_withdraw(higher_value=hyper_balance,lower_value=aevo_balance) + 1 # for fee
+        elif difference < -1:
+            direction = AEVO_TO_HYPER
+            withdraw_amount = amount_to_withdraw(higher_value=aevo_balance,lower_value=hyper_balance)
+        else:
+            return None
+        return {'direction': direction, 'withdraw_amount': withdraw_amount, 'step': 'withdraw', 'started_at': time.time()}
+
+    def arrival_is_usdc(self):
+        # hyper pays out native usdc, aevo pays out usdc.e
+        return self.state['direction'] == HYPER_TO_AEVO
+
+    def arrival_token(self):
+        client = self.eth_account_client
+        return client.USDC_CONTRACT_ADDRESS if self.arrival_is_usdc() else client.USDCE_CONTRACT_ADDRESS
+
+    async def balance(self, is_usdc:bool, min_block:int=0):
+        # get_usdc_balance returns None when the read fails, a guessed 0 would count funds already there as arrived
+        for attempt in range(BALANCE_RETRIES):
+            balance = await asyncio.to_thread(self.eth_account_client.get_usdc_balance, is_usdc=is_usdc, min_block=min_block)
+            if balance is not None:
+                return balance
+            logger.info(f"Error reading the {'usdc' if is_usdc else 'usdc.e'} balance, retrying")
+            await asyncio.sleep(2 ** attempt)
+        raise RuntimeError(f"Could not read the {'usdc' if is_usdc else 'usdc.e'} balance")
+
+    async def run(self, hyper_account=None, aevo_account=None):
+        """Resumes an unfinished rebalance, or plans a new one from the two accounts."""
+        if self.lock.locked():
+            logger.info("Rebalance already running")
+            return None
+        async with self.lock:
+            return await self.run_steps(hyper_account, aevo_account)
+
+    async def run_steps(self, hyper_account, aevo_account):
+        if self.stalled:
+            logger.error(f"Rebalance {self.state['direction']} stalled, see {self.state_file}")
+            return None
+        if not self.pending:
+            if hyper_account is None or aevo_account is None:
+                return None
+            self.state = self.plan(hyper_account, aevo_account)
+            if self.state is None:
+                return None
+            logger.info(f"Starting rebalance {self.state['direction']} for {self.state['withdraw_amount']}")
+            self.save()
+        else:
+            logger.info(f"Resuming rebalance {self.state['direction']} at {self.state['step']}")
+
+        while self.pending:
+            step = getattr(self, f"step_{self.state['step']}")
+            await step()
+        return self.state
+
+    async def step_withdraw(self):
+        if self.state.get('withdraw_sent_at'):
+            # we crashed after sending, the funds may be on their way
+            logger.warning("Rebalance withdraw was already sent, waiting for it instead")
+            self.transition('await_arrival')
+            return
+        try:
+            start_block = await self.watcher.block_number()
+        except Exception as e:
+            logger.info(f"Error reading block number {e}")
+            start_block = None
+        # a balance cached from before the last deposit would hide the arrival
+        start_balance = await self.balance(is_usdc=self.arrival_is_usdc(), min_block=start_block or 0)
+        self.transition('withdraw', start_balance=start_balance, start_block=start_block, withdraw_sent_at=time.time())
+        if self.state['direction'] == HYPER_TO_AEVO:
+            await asyncio.to_thread(self.hyper_client.withdraw, amount=self.state['withdraw_amount'])
+        else:
+            await self.aevo_client.withdraw(amount=self.state['withdraw_amount'])
+        self.transition('await_arrival')
+
+    async def step_await_arrival(self):
+        is_usdc = self.arrival_is_usdc()
+        start_balance = self.state['start_balance']
+        since_block = self.state.get('start_block')
+        deadline = self.state['withdraw_sent_at'] + self.arrival_timeout
+        min_block = 0
+        while True:
+            account_balance = await self.balance(is_usdc=is_usdc, min_block=min_block)
+            logger.info(f'checking account balance {account_balance}')
+            if account_balance > start_balance:
+                break
+            if time.time() > deadline:
+                self.transition('stalled', stalled_at=time.time())
+                await self.notify(f"Rebalance {self.state['direction']} stalled, {self.state['withdraw_amount']} "
+                                  f"withdrawn {int((time.time() - self.state['withdraw_sent_at']) / 60)} minutes ago hasn't arrived")
+                return
+            if since_block is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            try:
+                transfers = await self.watcher.wait_for(self.arrival_token(), since_block=since_block, timeout=self.poll_interval)
+                # read the balance at least at the block the transfer landed in, then wait for newer ones
+                min_block = since_block = max(transfer.block_number for transfer in transfers)
+                logger.info(f"Transfer of {sum(transfer.amount for transfer in transfers) / 10**6} arrived in block {min_block}")
+            except asyncio.TimeoutError:
+                pass
+            except Exception as e:
+                logger.info(f"Error waiting for transfer logs {e}")
+                await asyncio.sleep(self.poll_interval)
+        self.transition('swap', arrived_balance=account_balance)
+
+    async def step_swap(self):
+        to_usdc = self.state['direction'] == AEVO_TO_HYPER
+        if self.state.get('swap_sent_at'):
+            # if all of the input token is still there the swap never landed and is sent again
+            logger.warning("Rebalance swap was already sent, checking balances instead")
+            if await self.balance(is_usdc=not to_usdc) >= self.state['arrived_balance']:
+                self.state.pop('swap_sent_at')
+                self.save()
+                return
+            self.transition('deposit')
+            return
+        self.transition('swap', swap_sent_at=time.time())
+        receipt = await asyncio.to_thread(self.eth_account_client.swap_usdc, to_usdc=to_usdc, amount=self.state['arrived_balance'])
+        self.transition('deposit', swap_block=receipt['blockNumber'])
+
+    async def step_deposit(self):
+        to_aevo = self.state['direction'] == HYPER_TO_AEVO
+        if self.state.get('deposit_sent_at'):
+            # a deposit that landed took the deposit amount out of the wallet, otherwise it is sent again
+            logger.warning("Rebalance deposit was already sent, checking balances instead")
+            if await self.balance(is_usdc=not to_aevo) >= self.state['deposit_amount']:
+                self.state.pop('deposit_sent_at')
+                self.save()
+                return
+            self.transition('done', finished_at=time.time())
+            return
+        # aevo takes usdc.e, hyper takes native usdc
+        new_account_balance = await self.balance(is_usdc=not to_aevo, min_block=self.state.get('swap_block', 0))
+        self.transition('deposit', deposit_amount=new_account_balance, deposit_sent_at=time.time())
+        # an exception leaves deposit_sent_at set, whether it went out is read from the balance on resume
+        if to_aevo:
+            logger.info(f'depositing {new_account_balance} into aevo')
+            receipt = await self.aevo_client.deposit(amount=new_account_balance)
+        else:
+            logger.info(f'depositing {new_account_balance} into hyper')
+            receipt = await asyncio.to_thread(self.hyper_client.deposit, amount=new_account_balance)
+        if receipt is None or receipt['status'] != 1:
+            # nothing left the wallet, the next run sends it again
+            self.state.pop('deposit_sent_at')
+            self.save()
+            raise RuntimeError(f"Rebalance deposit of {new_account_balance} failed")
+        self.transition('done', finished_at=time.time())
+
 
 async def rebalance(hyper_client,aevo_client,hyper_account,aevo_account):
-    eth_account_client = EthAccountClient()
-    print('need to rebalance')
-    # closed out
-    # get account values for each
-    aevo_balance = float(aevo_account['balance'])
-    hyper_balance = float(hyper_account['withdrawable'])
-
-    # get the difference from both
-    difference = hyper_balance - aevo_balance
-
-    account_balance = 0
-    if difference > 1:
-        # withdraw from hyper and deposit to aevo
-        withdraw_amount = amount_to_withdraw(higher_value=hyper_balance,lower_value=aevo_balance) + 1 # for fee
-        # withdraw this amount from hyper
-        # with withdraw usdc
-        print('withdrawing hyper')
-        hyper_client.withdraw(amount=withdraw_amount)
-        while account_balance ==0:
-            account_balance = eth_account_client.get_usdc_balance(is_usdc=True)
-            print(f'checking account balance {account_balance}')
-            if account_balance >0: break
-            else: time.sleep(60)
-
-        ### need to swap to usdc.e ###
-        print('swapping coins')
-        eth_account_client.swap_usdc(to_usdc=False,amount=account_balance)
-
-        new_account_balance = eth_account_client.get_usdc_balance(is_usdc=False)
-        ### now that we have usdc.e deposit into aevo
-        print(f'depositing {new_account_balance} into aevo')
-        await aevo_client.deposit(amount=new_account_balance)
-
-
-    elif difference < -1:
-        # withdraw from aevo and deposit to hyper
-        withdraw_amount = amount_to_withdraw(higher_value=aevo_balance,lower_value=hyper_balance)
-        # withdraw this amount from aevo
-        print('withdrawing from aevo')
-        await aevo_client.withdraw(amount=withdraw_amount)
-        # will withdraw usdc.e
-        while account_balance == 0:
-            account_balance = eth_account_client.get_usdc_balance(is_usdc=False)
-            print(f'checking account balance {account_balance}')
-            if account_balance >0: break
-            else: time.sleep(60)
-        ### need to swap to usdc
-        eth_account_client.swap_usdc(to_usdc=True,amount=account_balance)
-        ## have usdc deposit into hyper
-        new_account_balance = eth_account_client.get_usdc_balance(is_usdc=True)
-        print(f'depositing {new_account_balance} into hyper')
-        hyper_client.deposit(amount=new_account_balance)
\ No newline at end of file
+    return await Rebalancer(hyper_client=hyper_client, aevo_client=aevo_client).run(hyper_account, aevo_account)
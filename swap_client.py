@@ -0,0 +1,190 @@
+import threading
+
+from loguru import logger
+from web3 import Web3
+
+from fee_oracle import get_fee_oracle
+from multicall import get_reader
+from nonce_manager import get_nonce_manager
+from web3_pool import erc20, get_contract
+
+# Uniswap v3 on Arbitrum One
+SWAP_ROUTER_02 = Web3.to_checksum_address('0x68b3465833fb72A70ecDF485E0e4C7bD8665Fc45')
+QUOTER_V2 = Web3.to_checksum_address('0x61fFE014bA17989E743c5F6cB21bF9697530B21e')
+MAX_UINT256 = 2**256 - 1
+
+SWAP_ROUTER_02_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "tokenIn", "type": "address"},
+                    {"name": "tokenOut", "type": "address"},
+                    {"name": "fee", "type": "uint24"},
+                    {"name": "recipient", "type": "address"},
+                    {"name": "amountIn", "type": "uint256"},
+                    {"name": "amountOutMinimum", "type": "uint256"},
+                    {"name": "sqrtPriceLimitX96", "type": "uint160"}
+                ],
+                "name": "params",
+                "type": "tuple"
+            }
+        ],
+        "name": "exactInputSingle",
+        "outputs": [{"name": "amountOut", "type": "uint256"}],
+        "stateMutability": "payable",
+        "type": "function"
+    },
+]
+QUOTER_V2_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "tokenIn", "type": "address"},
+                    {"name": "tokenOut", "type": "address"},
+                    {"name": "amountIn", "type": "uint256"},
+                    {"name": "fee", "type": "uint24"},
+                    {"name": "sqrtPriceLimitX96", "type": "uint160"}
+                ],
+                "name": "params",
+                "type": "tuple"
+            }
+        ],
+        "name": "quoteExactInputSingle",
+        "outputs": [
+            {"name": "amountOut", "type": "uint256"},
+            {"name": "sqrtPriceX96After", "type": "uint160"},
+            {"name": "initializedTicksCrossed", "type": "uint32"},
+            {"name": "gasEstimate", "type": "uint256"}
+        ],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+]
+
+
+class SwapClient:
+    """Quote-then-execute swaps on one Uniswap v3 pool through SwapRouter02.
+
+    Router and quoter contracts are built once per process, and the router allowance is
+    read once per token and then tracked locally, so a swap is a quote and a single transaction.
+    When an approve is needed it goes out right before the swap on consecutive nonces.
+    """
+
+    def __init__(self, web3, address:str, private_key:str, token_a:str, token_b:str, fee:int=500) -> None:
+        self.web3 = web3
+        self.address = Web3.to_checksum_address(address)
+        self.private_key = private_key
+        self.tokens = (Web3.to_checksum_address(token_a), Web3.to_checksum_address(token_b))
+        self.fee = fee
+        self.router = get_contract(web3, SWAP_ROUTER_02, SWAP_ROUTER_02_ABI)
+        self.quoter = get_contract(web3, QUOTER_V2, QUOTER_V2_ABI)
+        self.allowances = {}  # token -> allowance left for the router
+        self.unconfirmed = {}  # tx hash -> tx sent without waiting, see confirm
+        self.nonces = get_nonce_manager(web3.provider.endpoint_uri, address)
+        self.lock = threading.Lock()
+
+    def other(self, token_in:str):
+        token_in = Web3.to_checksum_address(token_in)
+        if token_in not in self.tokens:
+            raise ValueError(f"{token_in} is not in the pool")
+        return self.tokens[1] if token_in == self.tokens[0] else self.tokens[0]
+
+    def quote(self, token_in:str, amount_in:int):
+        """Expected output for ``amount_in`` raw units of ``token_in``."""
+        amount_out, _, _, _ = self.quoter.functions.quoteExactInputSingle(
+            (Web3.to_checksum_address(token_in), self.other(token_in), amount_in, self.fee, 0)
+        ).call()
+        return amount_out
+
+    def send(self, function, pending=None, wait:bool=True):
+        """Sends ``function`` as a transaction, returns the receipt or, without ``wait``, the hash.
+
+        ``pending`` is an unconfirmed transaction this one depends on. It only has to be waited
+        for when the gas limit isn't known yet and has to be estimated against the chain.
+        """
+        oracle = get_fee_oracle(self.web3.provider.endpoint_uri)
+        tx = function.build_transaction({
+            'chainId': 42161,
+            'from': self.address,
+            'gas': 0,
+            **oracle.fees(),
+        })
+        if pending is not None and oracle.cached_gas_limit(tx) is None:
+            self.nonces.wait(pending)
+        tx['gas'] = oracle.gas_limit(tx)
+        tx_hash = self.nonces.send(tx, self.private_key)
+        self.unconfirmed[tx_hash] = tx
+        if not wait:
+            return tx_hash
+        return self.confirm(tx_hash)
+
+    def confirm(self, tx_hash):
+        """Waits for a transaction from send, returns the receipt."""
+        tx = self.unconfirmed.pop(tx_hash)
+        receipt = self.nonces.wait(tx_hash)
+        get_fee_oracle(self.web3.provider.endpoint_uri).observe(receipt, tx)
+        return receipt
+
+    def ensure_allowance(self, token:str, amount:int):
+        """Approves the router for ``token`` if needed, returns the approve hash without waiting for it."""
+        if token not in self.allowances:
+            state = get_reader(self.web3).read(self.address, tokens=self.tokens, spenders=((token, SWAP_ROUTER_02),))
+            self.allowances[token] = state.allowances[(token, SWAP_ROUTER_02)]
+        if self.allowances[token] >= amount:
+            return None
+        logger.info(f"Approving router for {token}")
+        approve_hash = self.send(erc20(self.web3, token).functions.approve(SWAP_ROUTER_02, MAX_UINT256), wait=False)
+        # counted as done, a failed approve shows up as a failed swap and is read again
+        self.allowances[token] = MAX_UINT256
+        return approve_hash
+
+    def swap(self, token_in:str, amount_in:int, slippage:float=0.001, quote:int=None):
+        """Swaps ``amount_in`` of ``token_in`` for the other pool token, getting at least ``quote`` less ``slippage``.
+
+        Returns the receipt, the swap is mined when this returns.
+        """
+        token_in = Web3.to_checksum_address(token_in)
+        token_out = self.other(token_in)
+        with self.lock:
+            if quote is None:
+                quote = self.quote(token_in, amount_in)
+            amount_out_minimum = int(quote * (1 - slippage))
+            approve_hash = self.ensure_allowance(token_in, amount_in)
+            try:
+                receipt = self.send(self.router.functions.exactInputSingle(
+                    (token_in, token_out, self.fee, self.address, amount_in, amount_out_minimum, 0)
+                ), pending=approve_hash)
+            except Exception:
+                if approve_hash is not None:
+                    # the approve may not have landed, forget it and read the allowance again next time
+                    self.unconfirmed.pop(approve_hash, None)
+                    self.allowances.pop(token_in, None)
+                raise
+            if approve_hash is not None:
+                # mined by now, this only checks its gas
+                self.confirm(approve_hash)
+            if receipt['status'] != 1:
+                # a revert spends no allowance, but read it again to be sure
+                self.allowances.pop(token_in, None)
+                raise RuntimeError(f"Swap failed {receipt['transactionHash'].hex()}")
+            if self.allowances[token_in] != MAX_UINT256:
+                self.allowances[token_in] -= amount_in
+            get_reader(self.web3).invalidate(self.address)
+        logger.info(f"Swapped {amount_in} {token_in} for at least {amount_out_minimum} {token_out}")
+        return receipt
+
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def get_swap_client(web3, address:str, private_key:str, token_a:str, token_b:str, fee:int=500) -> SwapClient:
+    """Swap clients live for the whole process, so their contracts and allowances carry over between rebalances."""
+    key = (id(web3), Web3.to_checksum_address(address), *sorted([token_a.lower(), token_b.lower()]), fee)
+    with _lock:
+        client = _clients.get(key)
+        if client is None or client.web3 is not web3:
+            client = _clients[key] = SwapClient(web3, address, private_key, token_a, token_b, fee)
+        return client
@@ -1,4 +1,5 @@
 import math
+from decimal import Decimal
 
 def calculate_proximity_to_liquidation(mark_price, liquidation_price):
     if liquidation_price < mark_price:  # Long position
@@ -11,26 +12,46 @@ def amount_to_withdraw(higher_value:float,lower_value:float) -> None:
     mid_point = float((higher_value + lower_value)/2)
     return higher_value - mid_point
 
-def get_quantity(leverage:int,price:float,balance:float,coin:str):
+def step_decimals(step:float):
+    return max(0, -Decimal(str(step)).normalize().as_tuple().exponent)
+
+def floor_to_step(value:float,step:float):
+    # round the ratio first so 0.3 / 0.1 does not floor to 2
+    return round(math.floor(round(value / step, 9)) * step, step_decimals(step))
+
+def ceil_to_step(value:float,step:float):
+    return round(math.ceil(round(value / step, 9)) * step, step_decimals(step))
+
+def get_quantity(leverage:int,price:float,balance:float,coin:str,amount_step:float=None):
     size = balance / (price / leverage)
+    if amount_step is None:
+        amount_step = get_amount_step(coin)
+    return floor_to_step(size, amount_step)
+
+
+def get_amount_step(coin:str):
     if coin == 'DOGE':
-        return math.floor(size)  # Floor to the nearest integer for DOGE
+        return 1
     elif coin == 'SOL':
-        return math.floor(size * 10) / 10 # Round to 1 decimal place
+        return 0.1
     else:
-        return math.floor(size * 100) / 100  # Round to 2 decimal places for other coins
-    
+        return 0.01
+
 
-def round_aevo_price(coin:str,price:float,buyer:bool):
+def get_aevo_price_step(coin:str):
     if coin == 'DOGE':
-        if buyer: return math.floor(price*100000)/100000
-        else: return math.ceil(price*100000)/100000  # Floor to the nearest integer for DOGE
+        return 0.00001
     elif coin == 'BTC':
-        if buyer: return math.floor(price)
-        else: return math.ceil(price)
+        return 1
     else:
-        if buyer: return math.floor(price * 10) / 10
-        else: return math.ceil(price*10)/10
+        return 0.1
+
+
+def round_aevo_price(coin:str,price:float,buyer:bool,price_step:float=None):
+    if price_step is None:
+        price_step = get_aevo_price_step(coin)
+    if buyer: return floor_to_step(price, price_step)
+    else: return ceil_to_step(price, price_step)
 
 
 def round_price(price, max_sig_figs=5, max_decimals=6):
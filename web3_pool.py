@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import requests
+from aiohttp import ClientResponseError, ClientSession, ClientTimeout, TCPConnector
+from eth_utils import to_bytes
+from loguru import logger
+from web3 import AsyncWeb3, Web3
+from web3._utils.encoding import FriendlyJsonSerde, Web3JsonEncoder
+from web3.eth import AsyncEth
+from web3.middleware import geth_poa_middleware
+from web3.providers.async_rpc import AsyncHTTPProvider
+
+# Arbitrum One
+USDC = Web3.to_checksum_address('0xaf88d065e77c8cC2239327C5EDb3A432268e5831')
+USDC_E = Web3.to_checksum_address('0xff970a61a04b1ca14834a43f5de4533ebddb5cc8')
+
+# the ERC20 calls the root modules make, kept here so the pool doesn't depend on the aevo sdk
+ERC20_ABI = [
+    {
+        "inputs": [{"name": "account", "type": "address"}],
+        "name": "balanceOf",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "owner", "type": "address"}, {"name": "spender", "type": "address"}],
+        "name": "allowance",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "spender", "type": "address"}, {"name": "amount", "type": "uint256"}],
+        "name": "approve",
+        "outputs": [{"name": "", "type": "bool"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "to", "type": "address"}, {"name": "amount", "type": "uint256"}],
+        "name": "transfer",
+        "outputs": [{"name": "", "type": "bool"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+]
+
+POOL_LIMIT = 10  # connections kept open per endpoint
+TIMEOUT = 30
+BATCH_LIMIT = 50  # requests per JSON-RPC batch, public endpoints cap the batch size
+BATCH_RETRY = 60  # seconds of one by one requests after an endpoint turns a batch down
+
+
+class BatchingProvider(ABC):
+    """Async provider mixin that sends the requests made in one event loop tick as one JSON-RPC batch.
+
+    ``make_request`` queues the request and the queue is flushed when the loop comes back round,
+    so independent calls started together, e.g. with ``asyncio.gather``, share a round trip and a
+    call awaited on its own goes out alone like before. Subclasses implement ``send_batch``, which
+    takes a list of request dicts and returns their responses in any order.
+    """
+
+    def __init__(self, *args, batch_limit:int=BATCH_LIMIT, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.batch_limit = batch_limit
+        self.batch_ids = itertools.count()
+        self.queues = {}  # loop -> [(request, future)] waiting for the flush
+
+    @abstractmethod
+    async def send_batch(self, requests):
+        """Sends the request dicts, returns their responses in any order."""
+
+    async def make_request(self, method, params):
+        loop = asyncio.get_running_loop()
+        queue = self.queues.get(loop)
+        if queue is None:
+            queue = self.queues[loop] = []
+            # two hops, so calls made from tasks the callers start on the way (wait_for, gather) get in too
+            loop.call_soon(loop.call_soon, self.flush, loop)
+        future = loop.create_future()
+        queue.append(({'jsonrpc': '2.0', 'method': method, 'params': params or [], 'id': next(self.batch_ids)}, future))
+        return await future
+
+    def flush(self, loop):
+        queue = self.queues.pop(loop)
+        for start in range(0, len(queue), self.batch_limit):
+            loop.create_task(self.dispatch(queue[start:start + self.batch_limit]))
+
+    async def dispatch(self, batch):
+        try:
+            responses = await self.send_batch([request for request, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        responses = {response.get('id'): response for response in responses}
+        for request, future in batch:
+            if future.done():
+                # the caller stopped waiting
+                continue
+            response = responses.get(request['id'])
+            if response is None:
+                future.set_exception(ValueError(f"No response to {request['method']} in the batch"))
+            else:
+                future.set_result(response)
+
+
+class PooledAsyncHTTPProvider(BatchingProvider, AsyncHTTPProvider):
+    """AsyncHTTPProvider posting through one keep-alive aiohttp session with a connection limit.
+
+    web3's own session cache has no limit and is keyed by thread, this one is owned by the
+    provider and rebuilt when it is first used from a different event loop. Requests made in
+    the same tick are posted together, see BatchingProvider.
+    """
+
+    def __init__(self, endpoint_uri, limit=POOL_LIMIT, request_kwargs=None, batch_limit=BATCH_LIMIT) -> None:
+        super().__init__(endpoint_uri, request_kwargs, batch_limit=batch_limit)
+        self.limit = limit
+        self.session = None
+        self.session_loop = None
+        self.unbatched_until = 0
+
+    async def get_session(self):
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session.closed or self.session_loop is not loop:
+            if self.session is not None and not self.session.closed:
+                await self.close_stale(self.session, self.session_loop)
+            connector = TCPConnector(limit=self.limit, keepalive_timeout=60, ttl_dns_cache=300)
+            self.session = ClientSession(connector=connector, timeout=ClientTimeout(total=TIMEOUT), raise_for_status=True)
+            self.session_loop = loop
+        return self.session
+
+    @staticmethod
+    async def close_stale(session, session_loop):
+        # a session only closes cleanly on its own loop, one that already ended takes its sockets with it
+        if session_loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), session_loop)
+            return
+        try:
+            await session.close()
+        except Exception as e:
+            logger.info(f"Error closing a stale aiohttp session {e}")
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def post(self, payload):
+        request_data = to_bytes(text=FriendlyJsonSerde().json_encode(payload, cls=Web3JsonEncoder))
+        session = await self.get_session()
+        async with session.post(self.endpoint_uri, data=request_data, **self.get_request_kwargs()) as response:
+            raw_response = await response.read()
+        return self.decode_rpc_response(raw_response)
+
+    async def send_one_by_one(self, requests):
+        return await asyncio.gather(*(self.post(request) for request in requests))
+
+    async def send_batch(self, requests):
+        if len(requests) == 1:
+            return [await self.post(requests[0])]
+        if time.monotonic() < self.unbatched_until:
+            return await self.send_one_by_one(requests)
+        try:
+            responses = await self.post(requests)
+        except ClientResponseError as e:
+            if e.status not in (400, 413):
+                raise
+            responses = None
+        if not isinstance(responses, list):
+            # the endpoint doesn't take batches, or not this big or not right now, so this batch goes
+            # one by one and batching is tried again after a while
+            logger.warning(f"{self.endpoint_uri} turned down a batch of {len(requests)}, unbatched for {BATCH_RETRY}s")
+            self.unbatched_until = time.monotonic() + BATCH_RETRY
+            responses = await self.send_one_by_one(requests)
+        return responses
+
+
+_lock = threading.Lock()
+_web3s = {}
+_async_web3s = {}
+_contracts = {}
+_abi_keys = {}  # id(abi) -> (abi, digest), the abi is kept so its id can't be reused
+
+
+def get_web3(endpoint:str) -> Web3:
+    """The process-wide sync Web3 for ``endpoint``, on a keep-alive requests session."""
+    with _lock:
+        web3 = _web3s.get(endpoint)
+        if web3 is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=POOL_LIMIT)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            web3 = Web3(Web3.HTTPProvider(endpoint, request_kwargs={'timeout': TIMEOUT}, session=session))
+            web3.middleware_onion.inject(geth_poa_middleware, layer=0)  # Needed for some Ethereum testnets and sidechains like Arbitrum
+            _web3s[endpoint] = web3
+        return web3
+
+
+def get_async_web3(endpoint:str) -> AsyncWeb3:
+    """The process-wide AsyncWeb3 for ``endpoint``, see PooledAsyncHTTPProvider."""
+    with _lock:
+        web3 = _async_web3s.get(endpoint)
+        if web3 is None:
+            web3 = AsyncWeb3(
+                provider=PooledAsyncHTTPProvider(endpoint),
+                modules={'eth': (AsyncEth,)},
+                middlewares=[]
+            )
+            _async_web3s[endpoint] = web3
+        return web3
+
+
+def register(endpoint:str, web3:Web3=None, async_web3:AsyncWeb3=None):
+    """Puts prebuilt web3s on ``endpoint``, e.g. ones on an in-process test chain.
+
+    Everything that looks a web3 up by endpoint then gets these instead of HTTP ones.
+    """
+    with _lock:
+        if web3 is not None:
+            _web3s[endpoint] = web3
+        if async_web3 is not None:
+            _async_web3s[endpoint] = async_web3
+
+
+async def close_async_web3s():
+    for web3 in list(_async_web3s.values()):
+        await web3.provider.close()
+
+
+def abi_key(abi):
+    """A digest of the abi's JSON, so equal abis loaded separately share cache entries."""
+    entry = _abi_keys.get(id(abi))
+    if entry is None or entry[0] is not abi:
+        text = abi if isinstance(abi, str) else json.dumps(abi, sort_keys=True)
+        entry = _abi_keys[id(abi)] = (abi, hashlib.sha1(text.encode()).hexdigest())
+    return entry[1]
+
+
+def get_contract(web3, address:str, abi):
+    """Contract objects are cached per web3 instance, address and abi."""
+    address = Web3.to_checksum_address(address)
+    key = (id(web3), address, abi_key(abi))
+    contract = _contracts.get(key)
+    if contract is None or contract.w3 is not web3:
+        contract = _contracts[key] = web3.eth.contract(address=address, abi=abi)
+    return contract
+
+
+def erc20(web3, address:str):
+    return get_contract(web3, address, ERC20_ABI)
+